@@ -8,9 +8,11 @@ from auto_editor.utils.log import Log
 from auto_editor.utils.types import (
     Args,
     bitrate,
+    byte_size,
     color,
     frame_rate,
     margin,
+    natural,
     number,
     resolution,
     sample_rate,
@@ -38,6 +40,12 @@ def main_options(parser: ArgumentParser) -> ArgumentParser:
         metavar="METHOD",
         help="Decide which method to use when making edits",
     )
+    parser.add_argument(
+        "--levels-dtype",
+        metavar="DTYPE",
+        choices=("float64", "float32", "uint16"),
+        help="Set how precisely analysis levels are stored in memory and the cache",
+    )
     parser.add_argument(
         "--silent-speed",
         "-s",
@@ -165,6 +173,18 @@ def main_options(parser: ArgumentParser) -> ArgumentParser:
         metavar="PATH",
         help="Set where the temporary directory is located",
     )
+    parser.add_argument(
+        "--cache-max-size",
+        type=byte_size,
+        metavar="SIZE",
+        help="Remove the least recently used analysis results once the cache is larger than SIZE",
+    )
+    parser.add_argument(
+        "--cache-max-age",
+        type=number,
+        metavar="DAYS",
+        help="Remove analysis results that haven't been used for DAYS days",
+    )
     parser.add_argument(
         "--ffmpeg-location",
         metavar="PATH",
@@ -175,6 +195,13 @@ def main_options(parser: ArgumentParser) -> ArgumentParser:
         flag=True,
         help="Use the ffmpeg on your PATH instead of the one packaged",
     )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=natural,
+        metavar="NUM",
+        help="Analyze up to NUM sources, or parts of a source's motion, at once. 0 uses every CPU core",
+    )
     parser.add_text("Display Options:")
     parser.add_argument(
         "--progress",
@@ -229,6 +256,17 @@ def main_options(parser: ArgumentParser) -> ArgumentParser:
         flag=True,
         help="Disable file seeking when rendering video. Helpful for debugging desync issues",
     )
+    parser.add_argument(
+        "--render-jobs",
+        type=natural,
+        metavar="NUM",
+        help="Render video in NUM segments at once. 0 uses every CPU core",
+    )
+    parser.add_argument(
+        "--smart-render",
+        flag=True,
+        help="Copy video that isn't cut instead of re-encoding it, when possible",
+    )
     parser.add_text("Audio Rendering:")
     parser.add_argument(
         "--audio-codec",
@@ -270,7 +308,16 @@ def main_options(parser: ArgumentParser) -> ArgumentParser:
 
 
 def main() -> None:
-    subcommands = ("test", "info", "levels", "subdump", "desc", "repl", "palet")
+    subcommands = (
+        "test",
+        "info",
+        "levels",
+        "subdump",
+        "desc",
+        "repl",
+        "palet",
+        "cache",
+    )
 
     if len(sys.argv) > 1 and sys.argv[1] in subcommands:
         obj = __import__(
@@ -1,14 +1,18 @@
 from __future__ import annotations
 
-import os
 import re
-from dataclasses import dataclass
-from typing import TYPE_CHECKING
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, cast
 
 import numpy as np
 
-from auto_editor import version
-from auto_editor.lang.json import Lexer, Parser, dump
+from auto_editor.cache import (
+    DEFAULT_MAX_AGE,
+    DEFAULT_MAX_SIZE,
+    Cache,
+    cache_dir,
+    keyframes,
+)
 from auto_editor.lib.contracts import (
     is_bool,
     is_nat,
@@ -18,20 +22,24 @@ from auto_editor.lib.contracts import (
     is_void,
     orc,
 )
-from auto_editor.lib.data_structs import Sym
-from auto_editor.render.subtitle import SubtitleParser
+from auto_editor.lib.data_structs import Keyword, Sym
 from auto_editor.utils.cmdkw import (
     Required,
     pAttr,
     pAttrs,
 )
+from auto_editor.utils.log import run_workers
 from auto_editor.wavfile import read
 
 if TYPE_CHECKING:
+    from collections.abc import Iterator
     from fractions import Fraction
     from typing import Any
 
+    import av
     from av.filter import FilterContext
+    from av.subtitles.subtitle import Subtitle
+    from av.video.stream import VideoStream
     from numpy.typing import NDArray
 
     from auto_editor.ffwrapper import FileInfo
@@ -53,6 +61,8 @@ motion_builder = pAttrs(
     pAttr("stream", 0, is_nat),
     pAttr("blur", 9, is_nat),
     pAttr("width", 400, is_nat1),
+    pAttr("stride", 1, is_nat1),
+    pAttr("fast", False, is_bool),
 )
 subtitle_builder = pAttrs(
     "subtitle",
@@ -78,6 +88,13 @@ class FileSetup:
     bar: Bar
     temp: str
     log: Log
+    levels_dtype: str = "float64"
+    jobs: int = 1
+    cache_size: int = DEFAULT_MAX_SIZE
+    cache_age: float = DEFAULT_MAX_AGE
+
+
+AUDIO_CHUNK = 1 << 20
 
 
 class LevelError(Exception):
@@ -90,45 +107,187 @@ def link_nodes(*nodes: FilterContext) -> None:
 
 
 def to_threshold(arr: np.ndarray, t: int | float) -> NDArray[np.bool_]:
-    return np.fromiter((x >= t for x in arr), dtype=np.bool_)
+    # Unsigned levels are fixed-point fractions of their dtype's max value. The
+    # threshold is rounded the same way, so no level at or above it is lost.
+    if arr.dtype.kind == "u":
+        return np.asarray(arr >= np.rint(t * np.iinfo(arr.dtype).max))
+    return np.asarray(arr >= t)
+
+
+def quantize(arr: NDArray[np.float64], dtype: str) -> np.ndarray:
+    """Store levels in the range [0, 1] as `dtype`, trading precision for size."""
+    if dtype == "uint16":
+        return np.rint(np.clip(arr, 0, 1) * 65535).astype(np.uint16)
+    return arr.astype(dtype, copy=False)
+
+
+def tick_bounds(tb: Fraction, sr: int, start: int, stop: int) -> NDArray[np.int64]:
+    # Same as `int(i * (sr / tb))` for every tick in [start, stop].
+    spt_num = sr * tb.denominator
+    return np.arange(start, stop + 1, dtype=np.int64) * spt_num // tb.numerator
+
+
+def tick_peaks(samples: np.ndarray, starts: NDArray[np.int64]) -> NDArray[np.float64]:
+    """
+    Return the loudest sample, in absolute value, of each run of samples that begins
+    at `starts` and ends at the next start (or the end of `samples`).
+    """
+    highs = np.maximum.reduceat(samples, starts, axis=0)
+    lows = np.minimum.reduceat(samples, starts, axis=0)
+    if samples.ndim > 1:
+        highs = highs.max(axis=1)
+        lows = lows.min(axis=1)
+
+    highs = highs.astype(np.float64)
+    lows = -lows.astype(np.float64)
+    return np.where(lows > highs, lows, highs)
+
+
+def s16_resampler(sr: int) -> av.AudioResampler:
+    import av
+
+    # PyAV takes the names too, though its stubs only allow format and layout objects.
+    return av.AudioResampler("s16", "stereo", sr)  # type: ignore[arg-type]
+
+
+def resample(
+    resampler: av.AudioResampler, frame: av.AudioFrame | None
+) -> Iterator[np.ndarray]:
+    if frame is not None:
+        frame.pts = None  # Let the resampler handle gaps and overlaps.
+    for reframe in resampler.resample(frame):
+        yield reframe.to_ndarray().reshape(-1, 2)
+
+
+def iter_audio(src: FileInfo, stream: int, sr: int) -> Iterator[np.ndarray]:
+    """
+    Decode an audio stream chunk by chunk, giving the same stereo s16 samples
+    `Ensure.audio` would have written to a wav file.
+    """
+    import av
+
+    av.logging.set_level(av.logging.PANIC)
+
+    resampler = s16_resampler(sr)
+    with av.open(f"{src.path}") as cn:
+        for frame in cn.decode(cn.streams.audio[stream]):
+            yield from resample(resampler, frame)
+
+    yield from resample(resampler, None)
+
+
+def iter_samples(samples: np.ndarray) -> Iterator[np.ndarray]:
+    for i in range(0, len(samples), AUDIO_CHUNK):
+        yield samples[i : i + AUDIO_CHUNK]
+
+
+class AudioPeaks:
+    """Find the peak of every tick from chunks of samples, as they're decoded."""
+
+    __slots__ = ("tb", "sr", "blocks", "carry", "offset", "ticks")
+
+    def __init__(self, tb: Fraction, sr: int):
+        self.tb = tb
+        self.sr = sr
+        self.blocks: list[NDArray[np.float64]] = []
+        self.carry: np.ndarray | None = None
+        self.offset = 0  # Sample index of `carry[0]`
+        self.ticks = 0
+
+    def feed(self, chunk: np.ndarray) -> int:
+        """Add the next chunk of samples, and return how many ticks are done."""
+        spt_num = self.sr * self.tb.denominator
+        spt_den = self.tb.numerator
+
+        buf = chunk if self.carry is None else np.concatenate((self.carry, chunk))
+        avail = (self.offset + len(buf)) * spt_den // spt_num
+        if avail > self.ticks:
+            bounds = tick_bounds(self.tb, self.sr, self.ticks, avail) - self.offset
+            self.blocks.append(tick_peaks(buf[: bounds[-1]], bounds[:-1]))
+            buf = buf[bounds[-1] :]
+            self.offset += int(bounds[-1])
+            self.ticks = avail
+
+        self.carry = buf
+        return self.ticks
+
+    def finish(self) -> tuple[NDArray[np.float64], float, int]:
+        tail_peak = 0.0
+        samp_count = self.offset
+        if self.carry is not None and len(self.carry) > 0:
+            tail_peak = float(tick_peaks(self.carry, np.array([0]))[0])
+            samp_count += len(self.carry)
+
+        if not self.blocks:
+            return np.zeros((0), dtype=np.float64), tail_peak, samp_count
+        return np.concatenate(self.blocks), tail_peak, samp_count
+
+
+def audio_peaks(
+    chunks: Iterator[np.ndarray], tb: Fraction, sr: int, bar: Bar
+) -> tuple[NDArray[np.float64], float, int]:
+    peaks = AudioPeaks(tb, sr)
+    ticks = 0
+    for chunk in chunks:
+        if (done := peaks.feed(chunk)) > ticks:
+            ticks = done
+            bar.tick(ticks)
+
+    return peaks.finish()
+
+
+def _runs_of(
+    arr: NDArray[np.bool_], value: int
+) -> tuple[NDArray[np.intp], NDArray[np.intp]]:
+    """Return where each run of `value` starts, and where it ends (exclusive)."""
+    edges = np.flatnonzero(np.diff(arr == value, prepend=False, append=False))
+    return edges[::2], edges[1::2]
+
+
+def _mut_set_runs(
+    arr: NDArray[np.bool_],
+    starts: NDArray[np.intp],
+    ends: NDArray[np.intp],
+    with_: int,
+) -> None:
+    # Runs never touch each other, so every start and end index is unique.
+    marks = np.zeros(len(arr) + 1, dtype=np.int8)
+    marks[starts] = 1
+    marks[ends] = -1
+    arr[np.cumsum(marks[:-1], dtype=np.int8).view(np.bool_)] = with_
 
 
 def mut_remove_small(
     arr: NDArray[np.bool_], lim: int, replace: int, with_: int
 ) -> None:
-    start_p = 0
-    active = False
-    for j, item in enumerate(arr):
-        if item == replace:
-            if not active:
-                start_p = j
-                active = True
-
-            if j == len(arr) - 1 and j - start_p < lim:
-                arr[start_p:] = with_
-        elif active:
-            if j - start_p < lim:
-                arr[start_p:j] = with_
-            active = False
+    starts, ends = _runs_of(arr, replace)
+    lengths = ends - starts
+    # A run at the very end is removed if it is up to `lim` long, not under it.
+    lengths[ends == len(arr)] -= 1
+
+    small = lengths < lim
+    _mut_set_runs(arr, starts[small], ends[small], with_)
 
 
 def mut_remove_large(
     arr: NDArray[np.bool_], lim: int, replace: int, with_: int
 ) -> None:
-    start_p = 0
-    active = False
-    for j, item in enumerate(arr):
-        if item == replace:
-            if not active:
-                start_p = j
-                active = True
-
-            if j == len(arr) - 1 and j - start_p >= lim:
-                arr[start_p:] = with_
-        elif active:
-            if j - start_p > lim:
-                arr[start_p:j] = with_
-            active = False
+    starts, ends = _runs_of(arr, replace)
+    large = ends - starts > lim
+    _mut_set_runs(arr, starts[large], ends[large], with_)
+
+
+def motion_obj(
+    stream: int, blur: int, width: int, stride: int = 1, fast: bool = False
+) -> dict[str, Any]:
+    # Options left at their defaults aren't named, so levels cached before they
+    # existed are still found.
+    mobj: dict[str, Any] = {"stream": stream, "width": width, "blur": blur}
+    if stride != 1:
+        mobj["stride"] = stride
+    if fast:
+        mobj["fast"] = True
+    return mobj
 
 
 def obj_tag(tag: str, tb: Fraction, obj: dict[str, Any]) -> str:
@@ -140,6 +299,315 @@ def obj_tag(tag: str, tb: Fraction, obj: dict[str, Any]) -> str:
     return key
 
 
+def stream_ticks(stream: VideoStream, tb: Fraction) -> int:
+    """Guess how many ticks a video stream lasts, to size its levels up front."""
+    if stream.duration is not None and stream.time_base is not None:
+        return int(stream.duration * stream.time_base * tb) + 1
+    if stream.frames and stream.average_rate:
+        return int(stream.frames / stream.average_rate * tb) + 1
+    return 1024
+
+
+class MotionDiff:
+    """
+    Find how much of the picture changed since the frame before, for each tick.
+    When frames are skipped, ticks left without one are filled in from their neighbors.
+    """
+
+    __slots__ = (
+        "graph",
+        "blur",
+        "width",
+        "tb",
+        "total_pixels",
+        "stride",
+        "fill",
+        "threshold_list",
+        "seen",
+        "prev",
+        "prev_frame",
+        "changed",
+        "index",
+        "count",
+    )
+
+    def __init__(
+        self,
+        blur: int,
+        width: int,
+        tb: Fraction,
+        pixels: int,
+        stride: int = 1,
+        fill: bool = False,
+        size: int = 1024,
+    ):
+        self.graph: av.filter.Graph | None = None
+        self.blur = blur
+        self.width = width
+        self.tb = tb
+        self.total_pixels = pixels
+        self.stride = stride
+        self.fill = fill or stride > 1
+        self.threshold_list = np.zeros((max(size, 1)), dtype=np.float64)
+        self.seen = np.zeros((max(size, 1)), dtype=np.bool_)
+        self.prev: NDArray[np.uint8] | None = None
+        self.prev_frame: av.VideoFrame | None = None
+        self.changed: NDArray[np.bool_] | None = None
+        self.index = 0
+        self.count = 0
+
+    def make_graph(self, frame: av.VideoFrame) -> av.filter.Graph:
+        # Made from the first frame, since decoding at a lower resolution gives
+        # frames smaller than the stream says.
+        import av
+
+        graph = av.filter.Graph()
+        link_nodes(
+            graph.add_buffer(
+                width=frame.width,
+                height=frame.height,
+                format=frame.format,
+                time_base=frame.time_base,
+            ),
+            graph.add("scale", f"{self.width}:-1"),
+            graph.add("format", "gray"),
+            graph.add("gblur", f"sigma={self.blur}"),
+            graph.add("buffersink"),
+        )
+        graph.configure()
+        return graph
+
+    def feed(self, unframe: av.VideoFrame) -> None:
+        assert unframe.time is not None
+        self.index = index = int(unframe.time * self.tb)
+        self.count += 1
+        if (self.count - 1) % self.stride:
+            return
+
+        if self.graph is None:
+            self.graph = self.make_graph(unframe)
+        self.graph.push(unframe)
+        frame = cast("av.VideoFrame", self.graph.pull())
+
+        # Compare the gray planes where they are. Keeping the frame keeps its
+        # buffer from being reused while it's still the previous frame. PyAV's
+        # stubs don't say that planes are buffers.
+        plane = frame.planes[0]
+        current = np.frombuffer(plane, np.uint8)  # type: ignore[call-overload]
+        current = current.reshape(-1, plane.line_size)
+        current = current[: frame.height, : frame.width]
+
+        if index > len(self.threshold_list) - 1:
+            self.threshold_list = np.concatenate(
+                (self.threshold_list, np.zeros_like(self.threshold_list)), axis=0
+            )
+            self.seen = np.concatenate((self.seen, np.zeros_like(self.seen)), axis=0)
+
+        if self.prev is not None:
+            if self.changed is None:
+                self.changed = np.empty(current.shape, dtype=np.bool_)
+            np.not_equal(self.prev, current, out=self.changed)
+            count = np.count_nonzero(self.changed)
+            self.threshold_list[index] = count / self.total_pixels
+            self.seen[index] = True
+
+        self.prev = current
+        self.prev_frame = frame
+
+    def finish(self) -> NDArray[np.float64]:
+        threshold_list = self.threshold_list[: self.index]
+        if self.fill:
+            return fill_gaps(threshold_list, self.seen[: self.index])
+        return threshold_list
+
+
+def fill_gaps(arr: NDArray[np.float64], seen: NDArray[np.bool_]) -> NDArray:
+    """Interpolate the ticks of `arr` that aren't `seen` from the ones around them."""
+    if (known := np.flatnonzero(seen)).size == 0:
+        return arr
+    return np.interp(np.arange(len(arr)), known, arr[known])
+
+
+def fast_decoding(stream: VideoStream, width: int) -> None:
+    # Have the decoder skip frames that no other frame needs, skip the loop filter,
+    # and decode at half, quarter or eighth size when that's still `width` across
+    # and the codec can.
+    lowres = 0
+    while lowres < 3 and stream.width >> (lowres + 1) >= width:
+        lowres += 1
+    context: Any = stream.codec_context  # PyAV's stubs leave out `options`.
+    context.skip_frame = "NONREF"
+    context.options = {"skip_loop_filter": "all", "lowres": f"{lowres}"}
+
+
+def motion_part(
+    path: str,
+    s: int,
+    blur: int,
+    width: int,
+    fast: bool,
+    tb: Fraction,
+    pixels: int,
+    start: int | None,
+    stop: int | None,
+) -> tuple[NDArray[np.float64], NDArray[np.bool_], int]:
+    """
+    Analyze motion from the keyframe at pts `start` through the first frame at or
+    after pts `stop`. That frame starts the next part, which can't compare it to
+    the frame before, so it's compared here.
+
+    Return the levels of every tick reached, which ticks have one of their own,
+    and the tick of the last frame.
+    """
+    import av
+
+    av.logging.set_level(av.logging.PANIC)
+
+    with av.open(path) as cn:
+        stream = cn.streams.video[s]
+        stream.thread_type = "AUTO"
+        if fast:
+            fast_decoding(stream, width)
+        if start is not None:
+            cn.seek(start, stream=stream)
+
+        diff = MotionDiff(blur, width, tb, pixels, fill=fast)
+        for frame in cn.decode(stream):
+            if frame.pts is None or (start is not None and frame.pts < start):
+                continue
+            diff.feed(frame)
+            if stop is not None and frame.pts >= stop:
+                break
+
+    end = diff.index + 1
+    return diff.threshold_list[:end], diff.seen[:end], diff.index
+
+
+def subtitle_text(rect: Subtitle) -> str:
+    from av.subtitles.subtitle import AssSubtitle, TextSubtitle
+
+    if isinstance(rect, AssSubtitle):
+        # The last field of a dialogue line is the text, with style overrides in
+        # braces and escaped line breaks.
+        text = rect.ass.decode("utf-8", "replace").split(",", 8)[-1]
+        text = re.sub(r"\{[^}]*\}", "", text)
+        return text.replace("\\N", "\n").replace("\\n", "\n").replace("\\h", " ")
+    if isinstance(rect, TextSubtitle):
+        text = rect.text
+        return text.decode("utf-8", "replace") if isinstance(text, bytes) else text
+    return ""  # Bitmap subtitles have no text to match
+
+
+class SubtitleCues:
+    """Collect when each cue of a subtitle stream starts and ends, and its text."""
+
+    __slots__ = ("tb", "cues")
+
+    def __init__(self, tb: Fraction):
+        self.tb = tb
+        self.cues: list[tuple[int, int, str]] = []
+
+    def to_tick(self, ms: int) -> int:
+        # Cues used to be read from WebVTT files, which are precise to the millisecond.
+        return round(ms / 1000 * self.tb)
+
+    def feed(self, packet: av.Packet) -> None:
+        from av.subtitles.subtitle import SubtitleSet
+
+        if packet.pts is None or packet.time_base is None:
+            return
+
+        start = round(packet.pts * packet.time_base * 1000)
+        for item in packet.decode():
+            if type(item) is not SubtitleSet or not item:
+                continue
+
+            end = item.end_display_time
+            if not end and packet.duration:
+                end = round(packet.duration * packet.time_base * 1000)
+
+            self.cues.append(
+                (
+                    self.to_tick(start + item.start_display_time),
+                    self.to_tick(start + end),
+                    "\n".join(subtitle_text(rect) for rect in item),
+                )
+            )
+
+
+def plan_levels(nodes: list[Any]) -> list[tuple[str, dict[str, Any]]]:
+    """
+    Find which analysis methods a parsed `--edit` expression calls, and the options
+    that change how the source is decoded for them, without evaluating it. Calls
+    with options that aren't literals are left out.
+    """
+    plan: list[tuple[str, dict[str, Any]]] = []
+    decoding = {
+        "audio": ("stream",),
+        "motion": ("stream", "blur", "width", "stride", "fast"),
+        "subtitle": ("stream",),
+    }
+
+    shadowed = {
+        node[1].val
+        for node in walk_nodes(nodes)
+        if len(node) > 1 and node[0] == Sym("define") and type(node[1]) is Sym
+    }
+
+    def add(method: str, args: tuple) -> None:
+        attrs = builder_map[method].attrs
+        obj = {attr.n: attr.default for attr in attrs}
+        if method == "audio":
+            obj["stream"] = Sym("all")  # Unlike `levels`, `--edit` uses every stream
+        names = iter(attr.n for attr in attrs)
+        it = iter(args)
+        for arg in it:
+            if type(arg) is Keyword:
+                obj[arg.val] = next(it, None)
+            else:
+                obj[next(names, "")] = arg
+
+        for name in decoding[method]:
+            val = obj.get(name)
+            if type(val) not in (int, bool) and not (
+                name == "stream" and val == Sym("all")
+            ):
+                return
+
+        if method == "audio" and obj["stream"] == Sym("all"):
+            obj["stream"] = "all"
+        item = (method, {name: obj[name] for name in decoding[method]})
+        if item not in plan:
+            plan.append(item)
+
+    for node in walk_nodes(nodes, heads=True):
+        if type(node) is Sym:
+            if node.val in builder_map and node.val not in shadowed:
+                add(node.val, ())
+        elif node and type(node[0]) is Sym and node[0].val in builder_map:
+            if node[0].val not in shadowed:
+                add(node[0].val, node[1:])
+
+    return plan
+
+
+def walk_nodes(nodes: Any, heads: bool = False) -> Iterator[Any]:
+    """
+    Yield every list node in `nodes`, outer ones first, skipping quoted data. With
+    `heads`, also yield symbols that aren't the first item of a list.
+    """
+    for node in nodes:
+        if type(node) is tuple and node:
+            if node[0] == Sym("quote"):
+                continue
+            yield node
+            yield from walk_nodes(node[1:], heads)
+        elif type(node) is list:
+            yield from walk_nodes(node, heads)
+        elif heads and type(node) is Sym:
+            yield node
+
+
 @dataclass(slots=True)
 class Levels:
     ensure: Ensure
@@ -148,24 +616,20 @@ class Levels:
     bar: Bar
     temp: str
     log: Log
+    dtype: str = "float64"
+    jobs: int = 1
+    cache_size: int = DEFAULT_MAX_SIZE
+    cache_age: float = DEFAULT_MAX_AGE
+    # Levels found so far, by cache key, so they're only loaded or analyzed once.
+    memo: dict[str, Any] = field(default_factory=dict)
 
     @property
     def media_length(self) -> int:
         if self.src.audios:
-            if (arr := self.read_cache("audio", {"stream": 0})) is not None:
-                return len(arr)
-
-            sr, samples = read(self.ensure.audio(self.src, 0))
-            samp_count = len(samples)
-            del samples
-
-            samp_per_ticks = sr / self.tb
-            ticks = int(samp_count / samp_per_ticks)
-            self.log.debug(f"Audio Length: {ticks}")
-            self.log.debug(
-                f"... without rounding: {float(samp_count / samp_per_ticks)}"
-            )
-            return ticks
+            try:
+                return len(self.audio(0))
+            except LevelError:
+                return 0
 
         # If there's no audio, get length in video metadata.
         import av
@@ -192,77 +656,151 @@ class Levels:
     def all(self) -> NDArray[np.bool_]:
         return np.zeros(self.media_length, dtype=np.bool_)
 
-    def read_cache(self, tag: str, obj: dict[str, Any]) -> None | np.ndarray:
-        workfile = os.path.join(
-            os.path.dirname(self.temp), f"ae-{version}", "cache.json"
-        )
-
-        try:
-            with open(workfile, encoding="utf-8") as file:
-                cache = Parser(Lexer(workfile, file)).expr()
-        except Exception:
-            return None
-
-        if f"{self.src.path.resolve()}" not in cache:
-            return None
-
+    def cache_key(self, tag: str, obj: dict[str, Any]) -> str:
         key = obj_tag(tag, self.tb, obj)
+        return key if self.dtype == "float64" else f"{key}:{self.dtype}"
 
-        if key not in (root := cache[f"{self.src.path.resolve()}"]):
-            return None
+    def open_cache(self) -> Cache:
+        return Cache(cache_dir(self.temp), self.cache_size, self.cache_age)
 
-        return np.asarray(root[key]["arr"], dtype=root[key]["type"])
+    def read_cache(self, tag: str, obj: dict[str, Any]) -> None | np.ndarray:
+        key = self.cache_key(tag, obj)
+        if key not in self.memo:
+            arr = self.open_cache().get(self.src, key)
+            if arr is None:
+                return None
+            self.memo[key] = arr
+        return self.memo[key]
 
     def cache(self, tag: str, obj: dict[str, Any], arr: np.ndarray) -> np.ndarray:
-        workdur = os.path.join(os.path.dirname(self.temp), f"ae-{version}")
-        workfile = os.path.join(workdur, "cache.json")
-        if not os.path.exists(workdur):
-            os.mkdir(workdur)
-
-        key = obj_tag(tag, self.tb, obj)
+        arr = quantize(arr, self.dtype)
+        key = self.cache_key(tag, obj)
+        self.open_cache().put(self.src, key, arr)
+        self.memo[key] = arr
+        return arr
 
-        try:
-            with open(workfile, encoding="utf-8") as file:
-                json_object = Parser(Lexer(workfile, file)).expr()
-        except Exception:
-            json_object = {}
+    def prefetch(self, plan: list[tuple[str, dict[str, Any]]]) -> None:
+        """
+        Analyze everything in `plan` that hasn't been yet in one pass over the
+        source, instead of decoding it again for each method and stream.
+        """
+        import av
 
-        entry = {
-            "type": str(arr.dtype),
-            "arr": arr.tolist(),
-        }
+        av.logging.set_level(av.logging.PANIC)
 
-        src_key = f"{self.src.path}"
+        sr = self.ensure.sr
+        audios: list[int] = []
+        motions: list[dict[str, Any]] = []
+        subtitles: list[int] = []
+        for method, obj in plan:
+            s = obj["stream"]
+            if method == "audio":
+                for s in range(len(self.src.audios)) if s == "all" else (s,):
+                    if (
+                        s < len(self.src.audios)
+                        and s not in audios
+                        and (self.src, s) not in self.ensure.labels
+                        and sr / self.tb >= 1
+                        and self.read_cache("audio", {"stream": s}) is None
+                    ):
+                        audios.append(s)
+            elif method == "motion":
+                # Fast motion decodes the stream differently, so it can't share it,
+                # and with jobs, motion without a stride is split between processes
+                # instead.
+                if (
+                    s < len(self.src.videos)
+                    and not obj["fast"]
+                    and (self.jobs < 2 or obj["stride"] > 1)
+                    and self.read_cache("motion", motion_obj(**obj)) is None
+                ):
+                    motions.append(obj)
+            elif s < len(self.src.subtitles) and f"subtitle:{s}" not in self.memo:
+                subtitles.append(s)
+
+        # Each of these would be a pass of its own.
+        if len(audios) + len(motions) + len(subtitles) < 2:
+            return
 
-        if src_key in json_object:
-            json_object[src_key][key] = entry
-        else:
-            json_object[src_key] = {key: entry}
+        self.log.debug(
+            f"analyze: one pass for audio {audios}, motion {motions}, "
+            f"subtitle {subtitles}"
+        )
 
-        with open(os.path.join(workdur, "cache.json"), "w", encoding="utf-8") as file:
-            dump(json_object, file)
+        with av.open(f"{self.src.path}") as cn:
+            peaks = {
+                cn.streams.audio[s].index: (
+                    s,
+                    AudioPeaks(self.tb, sr),
+                    s16_resampler(sr),
+                )
+                for s in audios
+            }
+            pixels = 0
+            if motions:
+                pixels = self.src.videos[0].width * self.src.videos[0].height
+            diffs: dict[int, list[tuple[dict[str, Any], MotionDiff]]] = {}
+            for obj in motions:
+                stream = cn.streams.video[obj["stream"]]
+                stream.thread_type = "AUTO"
+                diff = MotionDiff(
+                    obj["blur"],
+                    obj["width"],
+                    self.tb,
+                    pixels,
+                    obj["stride"],
+                    size=stream_ticks(stream, self.tb),
+                )
+                diffs.setdefault(stream.index, []).append((obj, diff))
+            cues = {
+                cn.streams.subtitles[s].index: (s, SubtitleCues(self.tb))
+                for s in subtitles
+            }
+
+            self.bar.start(int(self.src.duration * self.tb), "Analyzing media")
+            demux = [cn.streams[i] for i in (*peaks, *diffs, *cues)]
+            for packet in cn.demux(demux):
+                index = packet.stream.index
+                if index in cues:
+                    cues[index][1].feed(packet)
+                    continue
+
+                if packet.pts is not None and packet.time_base is not None:
+                    self.bar.tick(int(packet.pts * packet.time_base * self.tb))
+
+                for frame in packet.decode():
+                    if isinstance(frame, av.AudioFrame):
+                        for chunk in resample(peaks[index][2], frame):
+                            peaks[index][1].feed(chunk)
+                    elif isinstance(frame, av.VideoFrame):
+                        for _, diff in diffs[index]:
+                            diff.feed(frame)
+
+        for s, audio, resampler in peaks.values():
+            for chunk in resample(resampler, None):
+                audio.feed(chunk)
+            try:
+                self.audio_levels(s, *audio.finish())
+            except LevelError:
+                pass  # Let `audio` report it, if it's used.
+
+        for items in diffs.values():
+            for obj, diff in items:
+                self.cache("motion", motion_obj(**obj), diff.finish())
+
+        for s, subtitle in cues.values():
+            self.memo[f"subtitle:{s}"] = subtitle.cues
 
-        return arr
+        self.bar.end()
 
-    def audio(self, s: int) -> NDArray[np.float64]:
+    def audio(self, s: int) -> np.ndarray:
         if s > len(self.src.audios) - 1:
             raise LevelError(f"audio: audio stream '{s}' does not exist.")
 
         if (arr := self.read_cache("audio", {"stream": s})) is not None:
             return arr
 
-        sr, samples = read(self.ensure.audio(self.src, s))
-
-        if len(samples) == 0:
-            raise LevelError(f"audio: stream '{s}' has no samples.")
-
-        def get_max_volume(s: np.ndarray) -> float:
-            return max(float(np.max(s)), -float(np.min(s)))
-
-        max_volume = get_max_volume(samples)
-        self.log.debug(f"Max volume: {max_volume}")
-
-        samp_count = samples.shape[0]
+        sr = self.ensure.sr
         samp_per_ticks = sr / self.tb
 
         if samp_per_ticks < 1:
@@ -272,29 +810,62 @@ class Levels:
                 "  Try `-fps 30` and/or `--sample-rate 48000`"
             )
 
-        audio_ticks = int(samp_count / samp_per_ticks)
+        # Reuse the wav file if rendering has already extracted it, otherwise
+        # decode straight from the source without touching the temp dir.
+        if (self.src, s) in self.ensure.labels:
+            sr, samples = read(self.ensure.audio(self.src, s))
+            chunks = iter_samples(samples)
+        else:
+            chunks = iter_audio(self.src, s, sr)
+
+        dur = self.src.audios[s].duration or self.src.duration
+        self.bar.start(int(dur * self.tb), "Analyzing audio volume")
+        try:
+            return self.audio_levels(s, *audio_peaks(chunks, self.tb, sr, self.bar))
+        finally:
+            self.bar.end()
+
+    def audio_levels(
+        self,
+        s: int,
+        threshold_list: NDArray[np.float64],
+        tail_peak: float,
+        samp_count: int,
+    ) -> np.ndarray:
+        if samp_count == 0:
+            raise LevelError(f"audio: stream '{s}' has no samples.")
+
+        audio_ticks = len(threshold_list)
+        samp_per_ticks = self.ensure.sr / self.tb
         self.log.debug(
             f"analyze: audio length: {audio_ticks} ({float(samp_count / samp_per_ticks)})"
         )
-        self.bar.start(audio_ticks, "Analyzing audio volume")
 
-        threshold_list = np.zeros((audio_ticks), dtype=np.float64)
+        max_volume = float(threshold_list.max()) if audio_ticks else 0.0
+        max_volume = max(max_volume, tail_peak)
+        self.log.debug(f"Max volume: {max_volume}")
 
         if max_volume == 0:  # Prevent dividing by zero
-            return threshold_list
+            return np.zeros((audio_ticks), dtype=self.dtype)
+
+        threshold_list /= max_volume
+        return self.cache("audio", {"stream": s}, threshold_list)
 
-        # Determine when audio is silent or loud.
-        for i in range(audio_ticks):
-            if i % 500 == 0:
-                self.bar.tick(i)
+    def subtitle_cues(self, stream: int) -> list[tuple[int, int, str]]:
+        if (cues := self.memo.get(f"subtitle:{stream}")) is not None:
+            return cues
 
-            start = int(i * samp_per_ticks)
-            end = min(int((i + 1) * samp_per_ticks), samp_count)
+        import av
 
-            threshold_list[i] = get_max_volume(samples[start:end]) / max_volume
+        av.logging.set_level(av.logging.PANIC)
 
-        self.bar.end()
-        return self.cache("audio", {"stream": s}, threshold_list)
+        found = SubtitleCues(self.tb)
+        with av.open(f"{self.src.path}") as cn:
+            for packet in cn.demux(subtitles=stream):
+                found.feed(packet)
+
+        self.memo[f"subtitle:{stream}"] = found.cues
+        return found.cues
 
     def subtitle(
         self,
@@ -313,40 +884,38 @@ class Levels:
         except re.error as e:
             self.log.error(e)
 
-        sub_file = self.ensure.subtitle(self.src, stream)
-        parser = SubtitleParser(self.tb)
-
-        with open(sub_file, encoding="utf-8") as file:
-            parser.parse(file.read(), "webvtt")
+        cues = self.subtitle_cues(stream)
 
         # stackoverflow.com/questions/9662346/python-code-to-remove-html-tags-from-a-string
         def cleanhtml(raw_html: str) -> str:
             cleanr = re.compile("<.*?>")
             return re.sub(cleanr, "", raw_html)
 
-        if not parser.contents:
+        if not cues:
             self.log.error("subtitle has no valid entries")
 
-        result = np.zeros((parser.contents[-1].end), dtype=np.bool_)
+        result = np.zeros((cues[-1][1]), dtype=np.bool_)
 
         count = 0
-        for content in parser.contents:
+        for start, end, text in cues:
             if max_count is not None and count >= max_count:
                 break
 
-            line = cleanhtml(content.after.strip())
+            line = cleanhtml(text.strip())
             if line and re.search(pattern, line):
-                result[content.start : content.end] = 1
+                result[start:end] = 1
                 count += 1
 
         return result
 
-    def motion(self, s: int, blur: int, width: int) -> NDArray[np.float64]:
+    def motion(
+        self, s: int, blur: int, width: int, stride: int = 1, fast: bool = False
+    ) -> np.ndarray:
         import av
 
         av.logging.set_level(av.logging.PANIC)
 
-        mobj = {"stream": s, "width": width, "blur": blur}
+        mobj = motion_obj(s, blur, width, stride, fast)
 
         if s >= len(self.src.videos):
             raise LevelError(f"motion: video stream '{s}' does not exist.")
@@ -354,57 +923,85 @@ class Levels:
         if (arr := self.read_cache("motion", mobj)) is not None:
             return arr
 
+        # A stride counts frames from the start of the stream, which a part that
+        # starts at a keyframe can't know, so those are analyzed in one go.
+        total_pixels = self.src.videos[0].width * self.src.videos[0].height
+        if self.jobs > 1 and stride == 1 and len(parts := self.motion_parts(s)) > 1:
+            arr = self.motion_in_parts(parts, s, blur, width, fast, total_pixels)
+            return self.cache("motion", mobj, arr)
+
         container = av.open(f"{self.src.path}", "r")
 
         stream = container.streams.video[s]
         stream.thread_type = "AUTO"
+        if fast:
+            fast_decoding(stream, width)
 
         inaccurate_dur = 1 if stream.duration is None else stream.duration
         self.bar.start(inaccurate_dur, "Analyzing motion")
 
-        prev_frame = None
-        current_frame = None
-        total_pixels = self.src.videos[0].width * self.src.videos[0].height
-        index = 0
-
-        graph = av.filter.Graph()
-        link_nodes(
-            graph.add_buffer(template=stream),
-            graph.add("scale", f"{width}:-1"),
-            graph.add("format", "gray"),
-            graph.add("gblur", f"sigma={blur}"),
-            graph.add("buffersink"),
-        )
-        graph.configure()
-
-        threshold_list = np.zeros((1024), dtype=np.float64)
+        size = stream_ticks(stream, self.tb)
+        diff = MotionDiff(blur, width, self.tb, total_pixels, stride, fast, size)
 
         for unframe in container.decode(stream):
-            graph.push(unframe)
-            frame = graph.pull()
+            diff.feed(unframe)
 
             # Showing progress ...
-            assert frame.time is not None
-            index = int(frame.time * self.tb)
-            if frame.pts is not None:
-                self.bar.tick(frame.pts)
-
-            current_frame = frame.to_ndarray()
-
-            if index > len(threshold_list) - 1:
-                threshold_list = np.concatenate(
-                    (threshold_list, np.zeros((len(threshold_list)), dtype=np.float64)),
-                    axis=0,
-                )
-
-            if prev_frame is not None:
-                # Use `int16` to avoid underflow with `uint8` datatype
-                diff = np.abs(
-                    prev_frame.astype(np.int16) - current_frame.astype(np.int16)
-                )
-                threshold_list[index] = np.count_nonzero(diff) / total_pixels
-
-            prev_frame = current_frame
+            if unframe.pts is not None:
+                self.bar.tick(unframe.pts)
 
         self.bar.end()
-        return self.cache("motion", mobj, threshold_list[:index])
+        return self.cache("motion", mobj, diff.finish())
+
+    def motion_parts(self, s: int) -> list[tuple[int | None, int | None]]:
+        """
+        Split video stream `s` at keyframes into up to `jobs` parts of about the same
+        length, as the pts each starts at and the next one starts at.
+        """
+        ticks, pts = keyframes(self.src, self.tb, self.open_cache(), s)
+        total = (self.src.videos[s].duration or self.src.duration) * self.tb
+
+        starts: list[int] = []
+        for k in range(1, self.jobs):
+            i = int(np.searchsorted(ticks, total * k / self.jobs, side="right")) - 1
+            if i > 0 and (not starts or pts[i] > starts[-1]):
+                starts.append(int(pts[i]))
+
+        bounds: list[int | None] = [None, *starts, None]
+        return list(zip(bounds, bounds[1:]))
+
+    def motion_in_parts(
+        self,
+        parts: list[tuple[int | None, int | None]],
+        s: int,
+        blur: int,
+        width: int,
+        fast: bool,
+        pixels: int,
+    ) -> NDArray[np.float64]:
+        """
+        Analyze each part in its own process, then put the parts back together.
+        Where parts share a tick, the later part's frame is the later one, so its
+        level wins, as it would if the stream were analyzed in one go.
+        """
+        self.log.debug(f"analyze: motion in {len(parts)} parts: {parts}")
+        self.bar.start(len(parts), "Analyzing motion")
+        path = f"{self.src.path}"
+        jobs_args = [
+            (path, s, blur, width, fast, self.tb, pixels, start, stop)
+            for start, stop in parts
+        ]
+        results = run_workers(motion_part, jobs_args, len(parts), self.bar, self.log)
+        self.bar.end()
+
+        end = results[-1][2]
+        threshold_list = np.zeros((end), dtype=np.float64)
+        seen = np.zeros((end), dtype=np.bool_)
+        for levels, found, _ in results:
+            levels, found = levels[:end], found[:end]
+            threshold_list[: len(levels)][found] = levels[found]
+            seen[: len(found)] |= found
+
+        if fast:
+            return fill_gaps(threshold_list, seen)
+        return threshold_list
@@ -0,0 +1,307 @@
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from hashlib import sha1
+from io import StringIO
+from pathlib import Path
+from tempfile import mkstemp
+from time import time
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from auto_editor import version
+from auto_editor.lang.json import Lexer, Parser, dump
+from auto_editor.lib.err import MyError
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from fractions import Fraction
+    from typing import IO, Any
+
+    from numpy.typing import NDArray
+
+    from auto_editor.ffwrapper import FileInfo
+
+
+# How many bytes are read from the start, middle and end of a source
+# when fingerprinting it.
+SAMPLE_SIZE = 1 << 20
+
+DEFAULT_MAX_SIZE = 1 << 30  # 1 GiB
+DEFAULT_MAX_AGE = 30 * 86400  # 30 days
+
+
+def cache_dir(temp: str) -> str:
+    return os.path.join(os.path.dirname(temp), f"ae-{version}")
+
+
+@lru_cache(maxsize=64)
+def _content_hash(path: str, size: int, mtime: int) -> str:
+    # Hashing a whole 20 GB source would cost more than analyzing it, so only
+    # a few spread out samples are used, along with the size.
+    digest = sha1(f"{size}".encode())
+    with open(path, "rb") as file:
+        for pos in (0, (size - SAMPLE_SIZE) // 2, size - SAMPLE_SIZE):
+            file.seek(max(pos, 0))
+            digest.update(file.read(SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+def fingerprint(path: Path) -> str:
+    """
+    Identify a source file by its path, size, modification time and content.
+    If any of those change, the fingerprint changes too.
+    """
+    resolved = f"{path.resolve()}"
+    stat = os.stat(resolved)
+    content = _content_hash(resolved, stat.st_size, stat.st_mtime_ns)
+    return f"{resolved}:{stat.st_size}:{stat.st_mtime_ns}:{content}"
+
+
+def _version(fp: str) -> str:
+    return sha1(fp.encode()).hexdigest()[:16]
+
+
+@dataclass(slots=True)
+class CacheEntry:
+    digest: str
+    size: int
+    last_used: float
+    src: str = ""
+    key: str = ""
+    fingerprint: str = ""
+
+    @property
+    def slot(self) -> str:
+        return self.digest.partition("-")[0]
+
+    @property
+    def is_stale(self) -> bool:
+        """Is the source gone or changed since this entry was made?"""
+        try:
+            return fingerprint(Path(self.src)) != self.fingerprint
+        except OSError:
+            return True
+
+
+def _atomic_write(path: str, write: Callable[[IO[bytes]], None]) -> None:
+    # Readers either see the old file or the whole new one, never a partial one.
+    fd, tmp = mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            write(file)
+        os.replace(tmp, path)
+    except OSError:
+        # On Windows, a file mapped by another process can't be replaced. That
+        # process wrote the same result, so there's nothing to lose.
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+class Cache:
+    """
+    Store analysis results as `.npy` files, one per entry, so that a lookup only
+    maps the file it needs. Files are written to a temporary name and renamed into
+    place, so any number of processes can share the cache without locking.
+    """
+
+    __slots__ = ("root", "max_size", "max_age")
+
+    def __init__(
+        self,
+        root: str,
+        max_size: int = DEFAULT_MAX_SIZE,
+        max_age: float = DEFAULT_MAX_AGE,
+    ):
+        self.root = root
+        self.max_size = max_size
+        self.max_age = max_age
+
+    def entry_path(self, digest: str) -> str:
+        return os.path.join(self.root, f"{digest}.npy")
+
+    def info_path(self, slot: str) -> str:
+        return os.path.join(self.root, f"{slot}.json")
+
+    @staticmethod
+    def slot(src: FileInfo, key: str) -> str:
+        return sha1(f"{src.path.resolve()}\n{key}".encode()).hexdigest()
+
+    def read_info(self, slot: str) -> dict[str, Any] | None:
+        path = self.info_path(slot)
+        try:
+            with open(path, encoding="utf-8") as file:
+                info = Parser(Lexer(path, file)).expr()
+        except (OSError, MyError):
+            return None
+        return info if isinstance(info, dict) else None
+
+    def _scan(self) -> tuple[list[CacheEntry], list[str]]:
+        # Only look at names and stats, so that this stays cheap with tens of
+        # thousands of entries. Also return temp files from processes that
+        # crashed mid-write, and descriptions whose entries are all gone.
+        entries = []
+        others = []
+        try:
+            with os.scandir(self.root) as it:
+                for item in it:
+                    if item.name.endswith(".npy"):
+                        try:
+                            stat = item.stat()
+                        except OSError:
+                            continue
+                        entries.append(
+                            CacheEntry(item.name[:-4], stat.st_size, stat.st_mtime)
+                        )
+                    elif item.name.endswith((".json", ".tmp")):
+                        others.append(item.name)
+        except OSError:
+            return [], []
+
+        slots = {e.slot for e in entries}
+        leftovers = [
+            name for name in others if name.endswith(".tmp") or name[:-5] not in slots
+        ]
+        entries.sort(key=lambda e: e.last_used)
+        return entries, leftovers
+
+    def entries(self) -> list[CacheEntry]:
+        """Return every complete entry, least recently used first."""
+        result = []
+        for entry in self._scan()[0]:
+            if (info := self.read_info(entry.slot)) is None:
+                continue  # Still being written, or being removed.
+
+            entry.src = info["src"]
+            entry.key = info["key"]
+            # An entry the description has moved on from is for an older
+            # version of its source.
+            if entry.digest == f"{entry.slot}-{_version(info['fingerprint'])}":
+                entry.fingerprint = info["fingerprint"]
+            result.append(entry)
+        return result
+
+    def get(self, src: FileInfo, key: str) -> np.ndarray | None:
+        version = _version(fingerprint(src.path))
+        path = self.entry_path(f"{self.slot(src, key)}-{version}")
+        try:
+            arr = np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass  # A read-only cache is still worth reading from.
+        return arr
+
+    def put(self, src: FileInfo, key: str, arr: np.ndarray) -> None:
+        os.makedirs(self.root, exist_ok=True)
+
+        slot = self.slot(src, key)
+        info = {
+            "src": f"{src.path.resolve()}",
+            "key": key,
+            "fingerprint": fingerprint(src.path),
+        }
+        digest = f"{slot}-{_version(info['fingerprint'])}"
+        old = self.read_info(slot)
+
+        def write_info(file: IO[bytes]) -> None:
+            text = StringIO()
+            dump(info, text)
+            file.write(text.getvalue().encode("utf-8"))
+
+        _atomic_write(
+            self.entry_path(digest), lambda f: np.save(f, arr, allow_pickle=False)
+        )
+        _atomic_write(self.info_path(slot), write_info)
+
+        # Results for an older version of this source can never be hit again.
+        if old is not None and "fingerprint" in old:
+            old_digest = f"{slot}-{_version(old['fingerprint'])}"
+            if old_digest != digest:
+                try:
+                    os.remove(self.entry_path(old_digest))
+                except OSError:
+                    pass
+        self.evict()
+
+    def remove(self, entries: list[CacheEntry]) -> None:
+        for entry in entries:
+            for path in (self.entry_path(entry.digest), self.info_path(entry.slot)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass  # Already removed by another process, or in use.
+
+    def _remove_leftovers(self, names: list[str]) -> None:
+        oldest = time() - 3600
+        for name in names:
+            path = os.path.join(self.root, name)
+            try:
+                if os.path.getmtime(path) < oldest:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def evict(self, stale: bool = False) -> list[CacheEntry]:
+        """
+        Enforce `max_age` and `max_size`, and if `stale` is set, remove entries
+        whose source has changed or is gone. Return the removed entries.
+        """
+        entries, leftovers = self._scan()
+        if stale:
+            entries = self.entries()
+        if not entries:
+            return []
+
+        oldest = time() - self.max_age
+        total = sum(e.size for e in entries)
+
+        removed = []
+        for entry in entries:
+            if (
+                entry.last_used < oldest
+                or total > self.max_size
+                or (stale and entry.is_stale)
+            ):
+                removed.append(entry)
+                total -= entry.size
+
+        self.remove(removed)
+        self._remove_leftovers(leftovers)
+        return removed
+
+
+def keyframes(
+    src: FileInfo, tb: Fraction, cache: Cache, s: int = 0
+) -> tuple[NDArray[np.int64], NDArray[np.int64]]:
+    """
+    Find every keyframe of one of the source's video streams by demuxing packets,
+    without decoding. Return their frame indexes under `tb` and their pts, which
+    are kept in `cache`.
+    """
+    import av
+
+    with av.open(f"{src.path}") as cn:
+        stream = cn.streams.video[s]
+        time_base = stream.time_base
+        pts = cache.get(src, f"keyframes:{s}")
+        if pts is None and time_base is not None:
+            found = [
+                packet.pts
+                for packet in cn.demux(stream)
+                if packet.is_keyframe and packet.pts is not None
+            ]
+            pts = np.unique(np.array(found, dtype=np.int64))
+            cache.put(src, f"keyframes:{s}", pts)
+
+    if pts is None or time_base is None:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty
+    return np.rint(pts * float(time_base * tb)).astype(np.int64), pts
@@ -8,6 +8,7 @@ from auto_editor.lib.contracts import is_int, is_str
 from auto_editor.make_layers import make_timeline
 from auto_editor.output import Ensure, mux_quality_media
 from auto_editor.render.audio import make_new_audio
+from auto_editor.render.smart import smart_render
 from auto_editor.render.subtitle import make_new_subtitles
 from auto_editor.render.video import render_av
 from auto_editor.timeline import v1, v3
@@ -291,7 +292,12 @@ def edit_media(
 
         if ctr.allow_video:
             if tl.v:
-                out_path, apply_later = render_av(ffmpeg, tl, args, bar, ctr, temp, log)
+                result = None
+                if args.smart_render:
+                    result = smart_render(tl, args, bar, ctr, temp, log)
+                if result is None:
+                    result = render_av(ffmpeg, tl, args, bar, ctr, temp, log)
+                out_path, apply_later = result
                 visual_output.append((True, out_path))
 
             for v, vid in enumerate(src.videos, start=1):
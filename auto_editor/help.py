@@ -43,6 +43,12 @@ Editing Methods:
     - stream nat? : 0
     - blur nat? : 9
     - width nat1? : 400
+    - stride nat1? : 1
+    - fast bool? : #f
+
+ ; stride only compares every nth frame. fast has the decoder skip frames
+ ; nothing refers to, and cut corners on the rest. Both are coarser but
+ ; much quicker on large sources. Ticks in between are interpolated.
 
  - subtitle  ; Detect when subtitle matches pattern as a RegEx string.
     - pattern string?
@@ -63,8 +69,44 @@ Command-line Examples:
   --edit motion
   --edit motion:threshold=2%,blur=3
   --edit (or audio:4% motion:2%,blur=3)
+  --edit motion:stride=4,fast=#t
   --edit none
   --edit all/e
+""".strip(),
+        "--levels-dtype": """
+Audio and motion levels are ratios from 0 to 1, one per timebase tick. By default,
+they are stored as float64. float32 halves the memory and cache size of long
+sources, and uint16 stores them as fractions of 65535 at the same size, both with
+more than enough precision for thresholds like 4%.
+
+Levels stored with different dtypes are cached separately.
+""".strip(),
+        "--jobs": """
+With more than one source, analyze up to NUM sources at once, each in
+its own process.
+
+With one source, motion detection is split instead: the video stream is
+cut into NUM parts of about the same length at keyframes, and each part
+is analyzed in its own process. The levels are the same as analyzing the
+stream in one go. Motion with a stride is always analyzed in one go,
+since its frames are counted from the start of the stream.
+""".strip(),
+        "--render-jobs": """
+Split the timeline into NUM segments of about the same length and render each one
+in its own process, with its own decoders and encoder. The segments are then
+joined without re-encoding. Splits are moved to nearby clip boundaries when
+possible.
+
+Each process opens every source, so memory use grows with NUM.
+""".strip(),
+        "--smart-render": """
+Copy every GOP (a keyframe and the frames that depend on it) that is kept whole
+straight from the source, and only re-encode the frames around each cut. This is
+much faster than re-encoding the whole video, and the copied parts lose no quality.
+
+Smart rendering needs a single h264 or hevc source that is output with the same
+codec, resolution, and frame rate, and no speed changes other than cutting. If
+any of these aren't met, the video is rendered normally.
 """.strip(),
         "--export": """
 This option controls how timelines are exported.
@@ -143,6 +185,16 @@ The following labels are recognized:
 If not set, tempdir will be set with Python's tempfile module
 The directory doesn't have to exist beforehand, however, the root path must be valid.
 Beware that the temp directory can get quite big.
+""".strip(),
+        "--cache-max-size": """
+Levels and keyframes are cached next to the temp directory, so that editing the
+same source again skips analysis. Once the cache is larger than SIZE, the entries
+used least recently are removed. Accepts units like `500M` or `2G`. The default is
+`1G`. `auto-editor cache` shows and prunes the cache.
+""".strip(),
+        "--cache-max-age": """
+Remove cached levels and keyframes that haven't been used for DAYS days, whatever
+the cache's size. The default is 30.
 """.strip(),
         "--ffmpeg-location": "This takes precedence over `--my-ffmpeg`.",
         "--my-ffmpeg": "This is equivalent to `--ffmpeg-location ffmpeg`.",
@@ -231,5 +283,26 @@ Examples:
         "_": "Dump text-based subtitles to stdout with formatting stripped out"
     },
     "desc": {"_": "Display a media's description metadata"},
+    "cache": {
+        "_": """
+Inspect and manage the analysis cache
+
+Actions:
+ - list   ; Show every entry, least recently used first
+ - stat   ; Show how many entries there are and how much space they take
+ - prune  ; Remove entries that are stale, too old, or over the size limit
+ - clear  ; Remove every entry
+
+An entry is stale when its source file has changed or no longer exists.
+Entries are also pruned automatically with the default limits whenever
+analysis adds a new one.
+
+Examples:
+  auto-editor cache stat
+  auto-editor cache prune --max-size 500M --max-age 7
+""".strip(),
+        "--max-size": "Default value: 1G. The units K, M and G are accepted.",
+        "--max-age": "Default value: 30",
+    },
     "test": {"_": "Self-Hosted Unit and End-to-End tests"},
 }
@@ -30,7 +30,7 @@ from auto_editor.lib.err import MyError
 from auto_editor.utils.func import boolop, mut_margin
 
 if TYPE_CHECKING:
-    from collections.abc import Callable
+    from collections.abc import Callable, Iterator
     from typing import Any, Literal, NoReturn
 
     from numpy.typing import NDArray
@@ -381,6 +381,11 @@ class Parser:
     def eat(self) -> None:
         self.current_token = self.lexer.get_next_token()
 
+    def exprs(self) -> Iterator[Any]:
+        """Parse each expression until the end of the text, one at a time."""
+        while self.current_token.type != EOF:
+            yield self.expr()
+
     def expr(self) -> Any:
         token = self.current_token
 
@@ -1514,6 +1519,8 @@ def edit_motion(
     stream: int = 0,
     blur: int = 9,
     width: int = 400,
+    stride: int = 1,
+    fast: bool = False,
 ) -> np.ndarray:
     if "@levels" not in env:
         raise MyError("Can't use `motion` if there's no input media")
@@ -1521,7 +1528,8 @@ def edit_motion(
     levels = env["@levels"]
     strict = env["@filesetup"].strict
     try:
-        return to_threshold(levels.motion(stream, blur, width), threshold)
+        arr = levels.motion(stream, blur, width, stride, fast)
+        return to_threshold(arr, threshold)
     except LevelError as e:
         return raise_(e) if strict else levels.all()
 
@@ -1621,9 +1629,9 @@ env.update({
         is_threshold, orc(is_nat, Sym("all")), is_nat,
         {"threshold": 0, "stream": 1, "minclip": 2, "mincut": 2}
     ),
-    "motion": Proc("motion", edit_motion, (0, 4),
-        is_threshold, is_nat, is_nat1,
-        {"threshold": 0, "stream": 1, "blur": 1, "width": 2}
+    "motion": Proc("motion", edit_motion, (0, 6),
+        is_threshold, is_nat, is_nat1, is_nat1, is_nat1, is_bool,
+        {"threshold": 0, "stream": 1, "blur": 1, "width": 2, "stride": 4, "fast": 5}
     ),
     "subtitle": Proc("subtitle", edit_subtitle, (1, 4),
         is_str, is_nat, is_bool, orc(is_nat, is_void),
@@ -1843,12 +1851,13 @@ env.update({
 # fmt: on
 
 
-def interpret(env: Env, parser: Parser) -> list:
+def interpret(env: Env, parser: Parser | list[Any]) -> list:
     result = []
 
     try:
-        while parser.current_token.type != EOF:
-            result.append(my_eval(env, parser.expr()))
+        # Evaluate each expression as soon as it's parsed, or the nodes given.
+        for node in parser.exprs() if isinstance(parser, Parser) else parser:
+            result.append(my_eval(env, node))
 
             if type(result[-1]) is Keyword:
                 raise MyError(f"Keyword misused in expression. `{result[-1]}`")
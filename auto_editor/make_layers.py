@@ -1,26 +1,28 @@
 from __future__ import annotations
 
+import os
 from fractions import Fraction
 from typing import TYPE_CHECKING, NamedTuple
 
 import numpy as np
 
-from auto_editor.analyze import FileSetup, Levels
+from auto_editor.analyze import FileSetup, Levels, plan_levels
 from auto_editor.ffwrapper import FFmpeg, FileInfo
 from auto_editor.lang.palet import Lexer, Parser, env, interpret, is_boolarr
 from auto_editor.lib.data_structs import print_str
 from auto_editor.lib.err import MyError
+from auto_editor.output import Ensure
 from auto_editor.timeline import ASpace, TlAudio, TlVideo, VSpace, v1, v3
+from auto_editor.utils.bar import Bar
+from auto_editor.utils.chunks import runs_of
 from auto_editor.utils.func import mut_margin
+from auto_editor.utils.log import Log, WorkerLog, run_workers
 from auto_editor.utils.types import Args, CoerceError, time
 
 if TYPE_CHECKING:
     from numpy.typing import NDArray
 
-    from auto_editor.output import Ensure
-    from auto_editor.utils.bar import Bar
     from auto_editor.utils.chunks import Chunks
-    from auto_editor.utils.log import Log
 
     BoolList = NDArray[np.bool_]
 
@@ -87,10 +89,26 @@ def run_interpreter_for_edit_option(
             log.debug(f"edit: {parser}")
 
         env["timebase"] = filesetup.tb
-        env["@levels"] = Levels(ensure, src, tb, bar, temp, log)
+        env["@levels"] = levels = Levels(
+            ensure,
+            src,
+            tb,
+            bar,
+            temp,
+            log,
+            filesetup.levels_dtype,
+            filesetup.jobs,
+            filesetup.cache_size,
+            filesetup.cache_age,
+        )
         env["@filesetup"] = filesetup
 
-        results = interpret(env, parser)
+        # See what the expression analyzes before running it, so that the source
+        # is decoded once for all of it.
+        nodes = list(parser.exprs())
+        levels.prefetch(plan_levels(nodes))
+
+        results = interpret(env, nodes)
 
         if len(results) == 0:
             raise MyError("Expression in --edit must return a bool-array, got nothing")
@@ -110,6 +128,77 @@ def run_interpreter_for_edit_option(
     return result
 
 
+def _analyze_source(
+    text: str,
+    src: FileInfo,
+    ffmpeg: FFmpeg,
+    sr: int,
+    tb: Fraction,
+    temp: str,
+    job_temp: str,
+    debug: bool,
+    levels_dtype: str,
+    cache_size: int,
+    cache_age: float,
+) -> NDArray[np.bool_]:
+    # Every worker numbers its extracted files from zero.
+    os.makedirs(job_temp, exist_ok=True)
+    log = WorkerLog(debug, quiet=True)
+    ensure = Ensure(ffmpeg, sr, job_temp, log)
+    filesetup = FileSetup(
+        src,
+        ensure,
+        False,
+        tb,
+        Bar("none"),
+        temp,
+        log,
+        levels_dtype,
+        cache_size=cache_size,
+        cache_age=cache_age,
+    )
+    return run_interpreter_for_edit_option(text, filesetup)
+
+
+def analyze_sources(
+    text: str,
+    sources: list[FileInfo],
+    ffmpeg: FFmpeg,
+    ensure: Ensure,
+    tb: Fraction,
+    bar: Bar,
+    temp: str,
+    log: Log,
+    args: Args,
+    jobs: int,
+) -> list[NDArray[np.bool_]]:
+    """
+    Evaluate `--edit` for every source at once in a pool of processes. Processes
+    are used because the interpreter's environment is global.
+    """
+    bar.start(len(sources), "Analyzing sources")
+    jobs_args = [
+        (
+            text,
+            src,
+            ffmpeg,
+            ensure.sr,
+            tb,
+            temp,
+            os.path.join(temp, f"job{i:x}"),
+            log.is_debug,
+            args.levels_dtype,
+            args.cache_max_size,
+            args.cache_max_age * 86400,
+        )
+        for i, src in enumerate(sources)
+    ]
+    results = run_workers(_analyze_source, jobs_args, min(jobs, len(sources)), bar, log)
+    bar.end()
+
+    return results
+
+
 def make_sane_timebase(fps: Fraction) -> Fraction:
     tb = round(fps, 2)
     ntsc = Fraction(30_000, 1001)
@@ -152,10 +241,33 @@ def make_timeline(
     src_index = np.array([], dtype=np.int32)
     concat = np.concatenate
 
-    for i, src in enumerate(sources):
-        filesetup = FileSetup(src, ensure, len(sources) < 2, tb, bar, temp, log)
+    jobs = args.jobs or os.cpu_count() or 1
+    if jobs > 1 and len(sources) > 1:
+        edit_results = analyze_sources(
+            method, sources, ffmpeg, ensure, tb, bar, temp, log, args, jobs
+        )
+    else:
+        edit_results = [
+            run_interpreter_for_edit_option(
+                method,
+                FileSetup(
+                    src,
+                    ensure,
+                    len(sources) < 2,
+                    tb,
+                    bar,
+                    temp,
+                    log,
+                    args.levels_dtype,
+                    jobs,
+                    args.cache_max_size,
+                    args.cache_max_age * 86400,
+                ),
+            )
+            for src in sources
+        ]
 
-        edit_result = run_interpreter_for_edit_option(method, filesetup)
+    for i, edit_result in enumerate(edit_results):
         mut_margin(edit_result, start_margin, end_margin)
 
         has_loud = concat((has_loud, edit_result))
@@ -164,16 +276,11 @@ def make_timeline(
     # Setup for handling custom speeds
     speed_index = has_loud.astype(np.uint)
     speed_map = [args.silent_speed, args.video_speed]
-    speed_hash = {
-        0: args.silent_speed,
-        1: args.video_speed,
-    }
 
     def get_speed_index(speed: float) -> int:
         if speed in speed_map:
             return speed_map.index(speed)
         speed_map.append(speed)
-        speed_hash[len(speed_map) - 1] = speed
         return len(speed_map) - 1
 
     def parse_time(val: str, arr: NDArray) -> int:
@@ -209,43 +316,28 @@ def make_timeline(
     except CoerceError as e:
         log.error(e)
 
-    def echunk(
-        arr: NDArray, src_index: NDArray[np.int32]
-    ) -> list[tuple[FileInfo, int, int, float]]:
-        arr_length = len(has_loud)
-
-        chunks = []
-        start = 0
-        doi = 0
-        for j in range(1, arr_length):
-            if (arr[j] != arr[j - 1]) or (src_index[j] != src_index[j - 1]):
-                src = sources[src_index[j - 1]]
-                chunks.append((src, start, j - doi, speed_map[arr[j - 1]]))
-                start = j - doi
-
-                if src_index[j] != src_index[j - 1]:
-                    start = 0
-                    doi = j
-
-        src = sources[src_index[j]]
-        chunks.append((src, start, arr_length, speed_map[arr[j]]))
-        return chunks
-
-    clips: list[Clip] = []
-    i = 0
-    start = 0
-    for chunk in echunk(speed_index, src_index):
-        if chunk[3] != 99999:
-            dur = round((chunk[2] - chunk[1]) / chunk[3])
-            if dur == 0:
-                continue
-
-            offset = int(chunk[1] / chunk[3])
-
-            if not (clips and clips[-1].start == round(start)):
-                clips.append(Clip(start, dur, offset, chunk[3], chunk[0]))
-            start += dur
-            i += 1
+    runs = runs_of(speed_index, src_index)
+    speeds = np.array(speed_map, dtype=np.float64)[runs.values]
+
+    # Drop cut out runs, then runs too short to last a single frame at their speed.
+    keep = speeds != 99999
+    durs = np.round((runs.ends[keep] - runs.starts[keep]) / speeds[keep])
+    offsets = np.trunc(runs.starts[keep] / speeds[keep])
+    nonzero = durs != 0
+
+    durs = durs[nonzero].astype(np.int64)
+    clip_starts = np.cumsum(durs) - durs
+
+    clips = [
+        Clip(start, dur, offset, speed_map[val], sources[src])
+        for start, dur, offset, val, src in zip(
+            clip_starts.tolist(),
+            durs.tolist(),
+            offsets[nonzero].astype(np.int64).tolist(),
+            runs.values[keep][nonzero].tolist(),
+            runs.srcs[keep][nonzero].tolist(),
+        )
+    ]
 
     vtl: VSpace = []
     atl: ASpace = []
@@ -261,23 +353,8 @@ def make_timeline(
                 atl.append([])
             atl[a].append(TlAudio(c.start, c.dur, c.src, c.offset, c.speed, 1, a))
 
-    # Turn long silent/loud array to formatted chunk list.
-    # Example: [1, 1, 1, 2, 2], {1: 1.0, 2: 1.5} => [(0, 3, 1.0), (3, 5, 1.5)]
-    def chunkify(arr: NDArray, smap: dict[int, float]) -> Chunks:
-        arr_length = len(arr)
-
-        chunks = []
-        start = 0
-        for j in range(1, arr_length):
-            if arr[j] != arr[j - 1]:
-                chunks.append((start, j, smap[arr[j - 1]]))
-                start = j
-        chunks.append((start, arr_length, smap[arr[j]]))
-        return chunks
-
     if len(sources) == 1 and inp is not None:
-        chunks = chunkify(speed_index, speed_hash)
-        v1_compatiable = v1(inp, chunks)
+        v1_compatiable = v1(inp, runs.to_chunks(speed_map))
     else:
         v1_compatiable = None
 
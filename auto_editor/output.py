@@ -19,6 +19,10 @@ class Ensure:
     labels: list[tuple[FileInfo, int]] = field(default_factory=list)
     sub_labels: list[tuple[FileInfo, int]] = field(default_factory=list)
 
+    @property
+    def sr(self) -> int:
+        return self._sr
+
     def audio(self, src: FileInfo, stream: int) -> str:
         try:
             label = self.labels.index((src, stream))
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import os.path
+from typing import TYPE_CHECKING
+
+import av
+import numpy as np
+from av.codec.codec import UnknownCodecError
+
+from auto_editor.cache import keyframes
+from auto_editor.output import video_quality
+from auto_editor.render.video import PyAVEncoder, analysis_cache, pyav_options
+
+if TYPE_CHECKING:
+    from fractions import Fraction
+
+    from numpy.typing import NDArray
+
+    from auto_editor.ffwrapper import FileInfo
+    from auto_editor.timeline import v3
+    from auto_editor.utils.bar import Bar
+    from auto_editor.utils.chunks import Chunks
+    from auto_editor.utils.container import Container
+    from auto_editor.utils.log import Log
+    from auto_editor.utils.types import Args
+
+    # (stream copy?, start, end) in source frame indexes
+    Segment = tuple[bool, int, int]
+
+
+# Codecs that repeat their parameter sets inside MPEG-TS, so segments from
+# different encoders can be joined without a shared header.
+smart_codecs = ("h264", "hevc")
+
+
+def plan_segments(chunks: Chunks, keys: NDArray[np.int64]) -> list[Segment]:
+    """
+    Split the kept parts of `chunks` into runs of whole GOPs, which can be
+    copied as is, and the partial GOPs at their edges, which must be re-encoded.
+    """
+    kept: list[list[int]] = []
+    for start, end, speed in chunks:
+        if speed == 99999:
+            continue
+        if kept and kept[-1][1] == start:
+            kept[-1][1] = end
+        else:
+            kept.append([start, end])
+
+    segments: list[Segment] = []
+    for start, end in kept:
+        i = np.searchsorted(keys, start, side="left")
+        j = np.searchsorted(keys, end, side="right") - 1
+        if i >= len(keys) or j < 0 or keys[i] >= keys[j]:
+            segments.append((False, start, end))
+            continue
+
+        first, last = int(keys[i]), int(keys[j])
+        if start < first:
+            segments.append((False, start, first))
+        segments.append((True, first, last))
+        if last < end:
+            segments.append((False, last, end))
+
+    return segments
+
+
+def why_not_smart(tl: v3, args: Args) -> str | None:
+    if tl.v1 is None:
+        return "the timeline isn't a single linear source"
+    src = tl.v1.source
+    if not src.videos:
+        return "the source has no video"
+    if args.scale != 1.0 or tl.res != src.get_res():
+        return "the resolution changes"
+    if tl.tb != src.get_fps():
+        return "the frame rate changes"
+    if any(speed not in (1.0, 99999) for _, _, speed in tl.v1.chunks):
+        return "some sections change speed"
+    if src.videos[0].codec not in smart_codecs:
+        return f"'{src.videos[0].codec}' video can't be joined"
+    try:
+        encoder = av.Codec(args.video_codec, "w").name
+        if encoder != av.Codec(src.videos[0].codec, "w").name:
+            return "the video codec changes"
+    except UnknownCodecError:
+        return f"'{args.video_codec}' isn't available for smart rendering"
+    return None
+
+
+def copy_segment(src: FileInfo, start: int, end: int, tb: Fraction, path: str) -> int:
+    with av.open(f"{src.path}") as cn, av.open(path, "w", format="mpegts") as out:
+        stream = cn.streams.video[0]
+        ostream = out.add_stream(template=stream)
+        if (time_base := stream.time_base) is not None:
+            cn.seek(int(start / tb / time_base), stream=stream)
+
+        count = 0
+        for packet in cn.demux(stream):
+            if packet.pts is None:
+                continue
+            index = round(packet.pts * packet.time_base * tb)
+            if packet.is_keyframe and index >= end:
+                break
+            if index < start:
+                continue
+
+            packet.stream = ostream
+            out.mux_one(packet)
+            count += 1
+
+    return count
+
+
+def encode_segment(
+    src: FileInfo,
+    start: int,
+    end: int,
+    tb: Fraction,
+    path: str,
+    options: tuple[str, dict[str, str]],
+) -> int:
+    vid = src.videos[0]
+    with av.open(f"{src.path}") as cn:
+        stream = cn.streams.video[0]
+        stream.thread_type = "AUTO"
+        pix_fmt = stream.codec_context.pix_fmt or "yuv420p"
+
+        encoder = PyAVEncoder(
+            path, *options, {}, tb, vid.width, vid.height, pix_fmt, vid.sar
+        )
+        if (time_base := stream.time_base) is not None:
+            cn.seek(int(start / tb / time_base), stream=stream)
+
+        for frame in cn.decode(stream):
+            index = round(frame.time * tb)
+            if index >= end:
+                break
+            if index < start:
+                continue
+            if frame.format.name != pix_fmt:
+                frame = frame.reformat(format=pix_fmt)
+            encoder.write(frame)
+
+        encoder.close()
+    return encoder.index
+
+
+def presentation_order(path: str) -> NDArray[np.intp]:
+    """
+    Return where each of the segment's packets, in decode order, is presented.
+    """
+    with av.open(path) as cn:
+        pts = [
+            packet.pts
+            for packet in cn.demux(cn.streams.video[0])
+            if packet.pts is not None and packet.dts is not None
+        ]
+    return np.argsort(np.argsort(pts, kind="stable"))
+
+
+def join_segments(paths: list[str], tb: Fraction, path: str) -> None:
+    """
+    Join MPEG-TS segments end to end, retimed so that every frame is presented one
+    frame after the one before it. Decoding runs ahead by the largest reorder delay
+    of any segment, so that dts never goes backwards between encoders.
+    """
+    orders = [presentation_order(segment) for segment in paths]
+    delay = max(
+        (int(np.max(np.arange(len(o)) - o)) for o in orders if len(o)), default=0
+    )
+
+    # A frame is a whole number of ticks in the output, whatever the frame rate.
+    options = {"video_track_timescale": f"{tb.numerator}"}
+    with av.open(path, "w", options=options) as out:
+        ostream = None
+        offset = 0
+        for segment, order in zip(paths, orders):
+            with av.open(segment) as cn:
+                stream = cn.streams.video[0]
+                if ostream is None:
+                    ostream = out.add_stream(template=stream)
+
+                packets = (
+                    packet
+                    for packet in cn.demux(stream)
+                    if packet.pts is not None and packet.dts is not None
+                )
+                for i, (packet, rank) in enumerate(zip(packets, order)):
+                    # Exact once the muxer rescales them to the track's timescale.
+                    step = 1 / (tb * packet.time_base)
+                    packet.pts = round((offset + int(rank)) * step)
+                    packet.dts = round((offset + i - delay) * step)
+                    packet.stream = ostream
+                    out.mux_one(packet)
+            offset += len(order)
+
+
+def smart_render(
+    tl: v3,
+    args: Args,
+    bar: Bar,
+    ctr: Container,
+    temp: str,
+    log: Log,
+) -> tuple[str, bool] | None:
+    """
+    Render video by copying every GOP that is kept whole and re-encoding only
+    the frames around cuts. Return None if the timeline doesn't allow that.
+    """
+    if (reason := why_not_smart(tl, args)) is not None:
+        log.warning(f"Can't smart render because {reason}. Rendering normally")
+        return None
+
+    assert tl.v1 is not None
+    src = tl.v1.source
+
+    if (translated := pyav_options(video_quality(args, ctr))) is None:
+        log.warning("Can't smart render with these video options. Rendering normally")
+        return None
+    codec, options, _ = translated
+
+    keys = np.unique(keyframes(src, tl.tb, analysis_cache(temp, args))[0])
+    segments = plan_segments(tl.v1.chunks, keys)
+    log.debug(f"Smart render segments: {segments}")
+
+    paths: list[str] = []
+    spedup = os.path.join(temp, "spedup0.mp4")
+    bar.start(len(segments), "Creating new video")
+    try:
+        for i, (copy, start, end) in enumerate(segments):
+            path = os.path.join(temp, f"smart{i:x}.ts")
+            if copy:
+                count = copy_segment(src, start, end, tl.tb, path)
+            else:
+                count = encode_segment(src, start, end, tl.tb, path, (codec, options))
+            if count > 0:
+                paths.append(path)
+            bar.tick(i)
+
+        join_segments(paths, tl.tb, spedup)
+    except av.error.FFmpegError as e:
+        bar.end()
+        log.error(f"Could not smart render: {e}")
+    bar.end()
+
+    return spedup, False
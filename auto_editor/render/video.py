@@ -1,39 +1,48 @@
 from __future__ import annotations
 
 import os.path
-from dataclasses import dataclass
-from subprocess import DEVNULL, PIPE
+from bisect import bisect_left
+from collections import OrderedDict
+from fractions import Fraction
+from queue import Empty, Queue
+from subprocess import DEVNULL, PIPE, Popen
 from sys import platform
-from typing import TYPE_CHECKING
+from threading import Thread
+from typing import TYPE_CHECKING, cast
 
 import av
 import numpy as np
+from av.video.frame import PictureType
 
+from auto_editor.cache import Cache, cache_dir, keyframes
 from auto_editor.output import video_quality
-from auto_editor.timeline import TlImage, TlRect, TlVideo
+from auto_editor.timeline import IntervalIndex, TlImage, TlRect, TlVideo
+from auto_editor.utils.bar import Bar
 from auto_editor.utils.encoder import encoders
+from auto_editor.utils.log import WorkerLog, run_workers
 from auto_editor.utils.types import color
 
 if TYPE_CHECKING:
-    from collections.abc import Iterator
+    from typing import Any
 
     from av.filter import FilterContext
+    from av.video.plane import VideoPlane
+    from av.video.stream import VideoStream
+    from numpy.typing import NDArray
 
     from auto_editor.ffwrapper import FFmpeg, FileInfo
     from auto_editor.timeline import v3
-    from auto_editor.utils.bar import Bar
     from auto_editor.utils.container import Container
     from auto_editor.utils.log import Log
     from auto_editor.utils.types import Args
 
-
-av.logging.set_level(av.logging.PANIC)
+    # Where an overlay goes in one plane, as (top, bottom, left, right), then the
+    # overlay times its alpha, and 256 minus its alpha. Alpha is a fixed-point
+    # number from 0 to 256.
+    PlaneBlend = tuple[int, int, int, int, NDArray[np.uint16], NDArray[np.uint16]]
 
 
-@dataclass(slots=True)
-class VideoFrame:
-    index: int
-    src: FileInfo
+av.logging.set_level(av.logging.PANIC)
 
 
 def link_nodes(*nodes: FilterContext) -> None:
@@ -67,6 +76,188 @@ allowed_pix_fmt = {
 }
 
 
+class GraphPool:
+    """
+    Keep one configured filter graph for every combination of input geometry,
+    pixel format and filters, instead of building a new graph for every frame.
+    """
+
+    __slots__ = ("graphs",)
+
+    def __init__(self) -> None:
+        self.graphs: dict[tuple, av.filter.Graph] = {}
+
+    def apply(self, frame: av.VideoFrame, *filters: tuple[str, str]) -> av.VideoFrame:
+        time_base = frame.time_base or Fraction(1)
+        key = (frame.width, frame.height, frame.format.name, time_base, filters)
+
+        if (graph := self.graphs.get(key)) is None:
+            graph = av.filter.Graph()
+            link_nodes(
+                graph.add_buffer(
+                    width=frame.width,
+                    height=frame.height,
+                    format=frame.format,
+                    time_base=time_base,
+                ),
+                *(graph.add(name, args) for name, args in filters),
+                graph.add("buffersink"),
+            )
+            graph.configure()
+            self.graphs[key] = graph
+
+        graph.push(frame)
+        return cast(av.VideoFrame, graph.pull())
+
+
+def pyav_options(
+    cmd: list[str],
+) -> tuple[str, dict[str, str], dict[str, str]] | None:
+    """
+    Translate ffmpeg output flags into a codec name, codec options and
+    container options. Return None if a flag has no PyAV counterpart here.
+    """
+    codec = "mpeg4"
+    options: dict[str, str] = {}
+    ctr_options: dict[str, str] = {}
+
+    for flag, val in zip(cmd[::2], cmd[1::2]):
+        if flag == "-c:v":
+            codec = val
+        elif flag == "-b:v":
+            options["b"] = val
+        elif flag == "-qscale:v":
+            # What ffmpeg does for `-qscale`. 118 is FF_QP2LAMBDA.
+            options["flags"] = "+qscale"
+            options["global_quality"] = f"{round(float(val) * 118)}"
+        elif flag == "-allow_sw":
+            options["allow_sw"] = val
+        elif flag == "-movflags":
+            ctr_options["movflags"] = val
+        elif flag != "-pix_fmt":
+            return None
+
+    return codec, options, ctr_options
+
+
+class PyAVEncoder:
+    """
+    Encode frames inside this process, instead of copying each one into a
+    rawvideo pipe to ffmpeg.
+    """
+
+    __slots__ = ("output", "stream", "time_base", "index")
+
+    def __init__(
+        self,
+        path: str,
+        codec: str,
+        options: dict[str, str],
+        ctr_options: dict[str, str],
+        tb: Fraction,
+        width: int,
+        height: int,
+        pix_fmt: str,
+        sar: Fraction | None,
+    ):
+        self.output = av.open(path, "w", options=ctr_options)
+        try:
+            self.stream = cast("VideoStream", self.output.add_stream(codec, rate=tb))
+            self.stream.width = width
+            self.stream.height = height
+            self.stream.pix_fmt = pix_fmt
+            self.stream.thread_type = "AUTO"
+            self.time_base = 1 / tb
+            # PyAV's stubs leave out `time_base` and `options`.
+            context: Any = self.stream.codec_context
+            context.time_base = self.time_base
+            context.options = options
+            if sar is not None:
+                context.sample_aspect_ratio = sar
+
+            # Open the encoder now so that an unusable setup can still fall back.
+            self.output.start_encoding()
+        except Exception:
+            self.output.close()
+            raise
+        self.index = 0
+
+    def write(self, frame: av.VideoFrame) -> None:
+        frame.pts = self.index
+        frame.time_base = self.time_base
+        # Let the encoder choose keyframes, not the source.
+        frame.pict_type = PictureType.NONE
+        self.output.mux(self.stream.encode(frame))
+        self.index += 1
+
+    def close(self) -> None:
+        self.output.mux(self.stream.encode(None))
+        self.output.close()
+
+
+def plane_buffers(frame: av.VideoFrame) -> list[np.ndarray]:
+    """
+    Return the frame's image data as rawvideo lays it out, without copying
+    planes that have no padding at the end of their lines.
+    """
+    fmt: Any = frame.format  # PyAV's stubs leave out `components`.
+    buffers: list[np.ndarray] = []
+    for i, plane in enumerate(frame.planes):
+        if len(frame.planes) == 1:
+            bits = fmt.padded_bits_per_pixel
+        else:
+            bits = sum(c.bits for c in fmt.components if c.plane == i)
+        line = plane.width * -(-bits // 8)
+
+        rows = plane_array(plane)
+        if line == plane.line_size:
+            buffers.append(rows)
+        else:
+            buffers.append(np.ascontiguousarray(rows[: plane.height, :line]))
+    return buffers
+
+
+class PipeWriter:
+    """
+    Write frames to ffmpeg's stdin from another thread, so that rendering the
+    next frames overlaps with the pipe. At most `size` frames wait in between.
+    """
+
+    __slots__ = ("process", "queue", "thread", "error")
+
+    def __init__(self, process: Popen, size: int = 8):
+        self.process = process
+        self.queue: Queue[av.VideoFrame | None] = Queue(size)
+        self.error: OSError | None = None
+        self.thread = Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self) -> None:
+        assert self.process.stdin is not None
+        while (frame := self.queue.get()) is not None:
+            if self.error is not None:
+                continue  # Keep draining so that `write` never blocks forever.
+            try:
+                for buffer in plane_buffers(frame):
+                    self.process.stdin.write(buffer)
+            except OSError as e:
+                self.error = e
+
+    def write(self, frame: av.VideoFrame) -> None:
+        if self.error is not None:
+            raise self.error
+        self.queue.put(frame)
+
+    def close(self) -> None:
+        assert self.process.stdin is not None
+        self.queue.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+        self.process.stdin.close()
+        self.process.wait()
+
+
 def apply_anchor(x: int, y: int, w: int, h: int, anchor: str) -> tuple[int, int]:
     if anchor == "ce":
         x = (x * 2 - w) // 2
@@ -82,6 +273,103 @@ def apply_anchor(x: int, y: int, w: int, h: int, anchor: str) -> tuple[int, int]
     return x, y
 
 
+# Formats that overlays are blended into directly: the log2 of how much their
+# chroma planes are subsampled across and down, and the full size format that
+# overlays are converted to first.
+blend_formats: dict[str, tuple[int, int, str]] = {
+    "yuv420p": (1, 1, "yuv444p"),
+    "yuvj420p": (1, 1, "yuvj444p"),
+    "yuv422p": (1, 0, "yuv444p"),
+    "yuvj422p": (1, 0, "yuvj444p"),
+    "yuv444p": (0, 0, "yuv444p"),
+    "yuvj444p": (0, 0, "yuvj444p"),
+    "gray": (0, 0, "gray"),
+}
+
+
+def plane_array(plane: VideoPlane) -> NDArray[np.uint8]:
+    # PyAV's stubs don't say that planes are buffers.
+    rows = np.frombuffer(plane, np.uint8)  # type: ignore[call-overload]
+    return rows.reshape(-1, plane.line_size)
+
+
+def copy_frame(frame: av.VideoFrame) -> av.VideoFrame:
+    copy = av.VideoFrame(frame.width, frame.height, frame.format.name)
+    for src, dst in zip(frame.planes, copy.planes):
+        size = min(src.line_size, dst.line_size)
+        plane_array(dst)[: dst.height, :size] = plane_array(src)[: src.height, :size]
+    return copy
+
+
+def block_mean(arr: NDArray[np.uint32], x: int, y: int, sx: int, sy: int) -> NDArray:
+    """
+    Average `arr`, placed at (x, y) of a plane, over the pixel blocks that a plane
+    subsampled by 2**sx across and 2**sy down is made of. Parts of a block that
+    `arr` doesn't cover count as 0.
+    """
+    bw, bh = 1 << sx, 1 << sy
+    dx, dy = x % bw, y % bh
+    h, w = arr.shape
+    padded = np.zeros((-(-(h + dy) // bh) * bh, -(-(w + dx) // bw) * bw), np.uint32)
+    padded[dy : dy + h, dx : dx + w] = arr
+
+    rows, cols = padded.shape[0] // bh, padded.shape[1] // bw
+    sums = padded.reshape(rows, bh, cols, bw).sum(axis=(1, 3))
+    return (sums + bw * bh // 2) // (bw * bh)
+
+
+def prepare_overlay(
+    img: NDArray[np.uint8], opacity: float, pix_fmt: str, x: int, y: int
+) -> list[PlaneBlend]:
+    """
+    Convert the rgba image `img`, to be drawn at (x, y), for blending into frames
+    of `pix_fmt`, or into rgb24 arrays if `pix_fmt` isn't in `blend_formats`.
+    """
+    h, w, _ = img.shape
+    alpha = (img[:, :, 3].astype(np.uint32) * round(opacity * 256) + 127) // 255
+
+    if pix_fmt in blend_formats:
+        sx, sy, full = blend_formats[pix_fmt]
+        rgb = av.VideoFrame.from_ndarray(
+            np.ascontiguousarray(img[:, :, :3]), format="rgb24"
+        )
+        channels = [plane_array(p)[:h, :w] for p in rgb.reformat(format=full).planes]
+    else:
+        sx = sy = 0
+        channels = [img[:, :, i] for i in range(3)]
+
+    blends: list[PlaneBlend] = []
+    for i, channel in enumerate(channels):
+        premul = channel.astype(np.uint32) * alpha
+        px, py = (sx, sy) if i > 0 else (0, 0)
+        if px or py:
+            a = block_mean(alpha, x, y, px, py)
+            # Keep `roi * (256 - a) + premul` within 16 bits after rounding.
+            premul = np.minimum(block_mean(premul, x, y, px, py), 255 * a)
+        else:
+            a = alpha
+
+        top, left = y >> py, x >> px
+        blends.append(
+            (
+                top,
+                top + a.shape[0],
+                left,
+                left + a.shape[1],
+                premul.astype(np.uint16),
+                (256 - a).astype(np.uint16),
+            )
+        )
+    return blends
+
+
+def blend_overlay(planes: list[NDArray[np.uint8]], blends: list[PlaneBlend]) -> None:
+    """Blend a prepared overlay into `planes` in place, touching only its area."""
+    for plane, (top, bottom, left, right, premul, inverse) in zip(planes, blends):
+        roi = plane[top:bottom, left:right]
+        roi[:] = (roi * inverse + premul + 128) >> 8
+
+
 def make_solid(width: int, height: int, pix_fmt: str, bg: str) -> av.VideoFrame:
     hex_color = bg.lstrip("#").upper()
     rgb_color = tuple(int(hex_color[i : i + 2], 16) for i in (0, 2, 4))
@@ -91,11 +379,197 @@ def make_solid(width: int, height: int, pix_fmt: str, bg: str) -> av.VideoFrame:
     return rgb_frame.reformat(format=pix_fmt)
 
 
+# How many bytes of decoded frames are kept for reuse, split between sources.
+FRAME_CACHE_SIZE = 1 << 28  # 256 MiB
+
+
+def frame_size(frame: av.VideoFrame) -> int:
+    return sum(plane.buffer_size for plane in frame.planes)
+
+
+def analysis_cache(temp: str, args: Args) -> Cache:
+    return Cache(cache_dir(temp), args.cache_max_size, args.cache_max_age * 86400)
+
+
+class FrameServer:
+    """
+    Serve frames from a source's first video stream by index, in any order, keeping
+    up to `budget` bytes of the frames decoded most recently.
+    """
+
+    __slots__ = (
+        "cn",
+        "stream",
+        "decoder",
+        "tb",
+        "keys",
+        "key_pts",
+        "prev",
+        "index",
+        "frame",
+        "cache",
+        "size",
+        "budget",
+        "skipped",
+        "log",
+    )
+
+    def __init__(
+        self,
+        src: FileInfo,
+        tb: Fraction,
+        cache: Cache,
+        budget: int,
+        no_seek: bool,
+        log: Log,
+    ):
+        self.cn = av.open(f"{src.path}")
+        self.stream = self.cn.streams.video[0]
+        self.stream.thread_type = "AUTO"
+        self.decoder = self.cn.decode(self.stream)
+        self.tb = tb
+
+        if no_seek:
+            self.keys = self.key_pts = np.array([], dtype=np.int64)
+        else:
+            self.keys, self.key_pts = keyframes(src, tb, cache)
+
+        # Indexes of the last two decoded frames. The last one also stands in for
+        # every index in between.
+        self.prev = self.index = -1
+        self.frame: av.VideoFrame | None = None
+        # A frame, or the index of the frame that fills a gap in the source.
+        self.cache: OrderedDict[int, av.VideoFrame | int] = OrderedDict()
+        self.size = 0
+        self.budget = budget
+        self.skipped = 0
+        self.log = log
+
+    def get(self, index: int) -> av.VideoFrame | None:
+        """
+        Return the frame at `index`, or the first one after it if the source has a
+        gap there. Return None if the source ends before it.
+        """
+        if (frame := self.cached(index)) is not None:
+            return frame
+        if self.prev < index < self.index:
+            self.keep(index, self.index)
+            return self.frame
+
+        # Go back, or skip past a keyframe, by seeking to the last one before `index`.
+        k = int(np.searchsorted(self.keys, index, side="right")) - 1
+        if self.index > index or (k >= 0 and self.keys[k] > self.index + 1):
+            self.seek(k)
+
+        while self.index < index:
+            try:
+                frame = next(self.decoder)
+            except StopIteration:
+                return None
+
+            self.prev, self.index = self.index, round(frame.time * self.tb)
+            self.frame = frame
+            self.keep(self.index, frame)
+            if frame.key_frame:
+                self.log.debug(f"Keyframe {self.index} {frame.pts}")
+
+        if self.index > index:
+            # The source has a gap at `index`, and this frame fills it.
+            self.keep(index, self.index)
+
+        return self.frame
+
+    def seek(self, k: int) -> None:
+        # Go to keyframe `k`, or the start of the file if there isn't one.
+        if k >= 0:
+            self.log.debug(f"Seek: {self.index} -> {self.keys[k]}")
+            self.skipped += max(self.keys[k] - self.index - 1, 0)
+            self.cn.seek(int(self.key_pts[k]), stream=self.stream)
+        else:
+            self.log.debug(f"Seek: {self.index} -> 0")
+            self.cn.seek(0)
+
+        # The old decoder may have already hit the end of the file.
+        self.decoder = self.cn.decode(self.stream)
+        self.prev = self.index = -1
+
+    def cached(self, index: int) -> av.VideoFrame | None:
+        if (frame := self.cache.get(index)) is None:
+            return None
+        self.cache.move_to_end(index)
+        if isinstance(frame, int):
+            return self.cached(frame)
+        return frame
+
+    def keep(self, index: int, frame: av.VideoFrame | int) -> None:
+        # Only frames count against the budget, not indexes that point to them.
+        if isinstance(old := self.cache.pop(index, None), av.VideoFrame):
+            self.size -= frame_size(old)
+        self.cache[index] = frame
+        if isinstance(frame, av.VideoFrame):
+            self.size += frame_size(frame)
+
+        while self.size > self.budget and len(self.cache) > 1:
+            _, old = self.cache.popitem(last=False)
+            if isinstance(old, av.VideoFrame):
+                self.size -= frame_size(old)
+
+    def close(self) -> None:
+        self.cache.clear()
+        self.cn.close()
+
+
+class DecodeAhead:
+    """
+    Get the frames in `plan`, in order, from a FrameServer on another thread, so
+    that decoding overlaps with compositing and encoding. At most `size` frames
+    wait in between.
+    """
+
+    __slots__ = ("server", "plan", "queue", "thread", "stopped")
+
+    def __init__(self, server: FrameServer, plan: list[int], size: int = 8):
+        self.server = server
+        self.plan = plan
+        self.queue: Queue[av.VideoFrame | None | Exception] = Queue(size)
+        self.stopped = False
+        self.thread = Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self) -> None:
+        try:
+            for index in self.plan:
+                frame = self.server.get(index)
+                if self.stopped:
+                    return
+                self.queue.put(frame)
+        except Exception as e:
+            self.queue.put(e)
+
+    def get(self) -> av.VideoFrame | None:
+        """Return the next planned frame, or None if the source ended before it."""
+        if isinstance(item := self.queue.get(), Exception):
+            raise item
+        return item
+
+    def close(self) -> None:
+        self.stopped = True
+        while self.thread.is_alive():
+            try:
+                self.queue.get(timeout=0.1)  # Unblock a waiting `put`.
+            except Empty:
+                pass
+
+
+def source_index(obj: TlVideo, index: int) -> int:
+    return round((obj.offset + index - obj.start) * obj.speed)
+
+
 def make_image_cache(tl: v3) -> dict[tuple[FileInfo, int], np.ndarray]:
     img_cache = {}
     for clip in tl.v:
         for obj in clip:
-            if isinstance(obj, TlImage) and obj.src not in img_cache:
+            if isinstance(obj, TlImage) and (obj.src, obj.width) not in img_cache:
                 with av.open(obj.src.path) as cn:
                     my_stream = cn.streams.video[0]
                     for frame in cn.decode(my_stream):
@@ -109,13 +583,13 @@ def make_image_cache(tl: v3) -> dict[tuple[FileInfo, int], np.ndarray]:
                             graph.push(frame)
                             frame = graph.pull()
                         img_cache[(obj.src, obj.width)] = frame.to_ndarray(
-                            format="rgb24"
+                            format="rgba"
                         )
                         break
     return img_cache
 
 
-def render_av(
+def render_frames(
     ffmpeg: FFmpeg,
     tl: v3,
     args: Args,
@@ -123,45 +597,33 @@ def render_av(
     ctr: Container,
     temp: str,
     log: Log,
-) -> tuple[str, bool]:
+    frames: range,
+    spedup: str,
+) -> bool:
+    """
+    Render the timeline's `frames` to the video file `spedup`. Return whether video
+    quality settings still need to be applied.
+    """
     src = tl.src
-    cns: dict[FileInfo, av.InputContainer] = {}
-    decoders: dict[FileInfo, Iterator[av.VideoFrame]] = {}
-    seek_cost: dict[FileInfo, int] = {}
-    tous: dict[FileInfo, int] = {}
+    servers: dict[FileInfo, FrameServer] = {}
 
     target_pix_fmt = "yuv420p"  # Reasonable default
     img_cache = make_image_cache(tl)
 
-    first_src: FileInfo | None = None
-    for src in tl.sources:
-        if first_src is None:
-            first_src = src
-
-        if src not in cns:
-            cns[src] = av.open(f"{src.path}")
+    sources = dict.fromkeys(tl.sources)
+    first_src = next(iter(sources), None)
+    budget = FRAME_CACHE_SIZE // max(sum(1 for s in sources if s.videos), 1)
 
-    for src, cn in cns.items():
-        if len(cn.streams.video) > 0:
-            stream = cn.streams.video[0]
-            stream.thread_type = "AUTO"
+    cache = analysis_cache(temp, args)
+    for src in sources:
+        if src.videos:
+            server = FrameServer(src, tl.tb, cache, budget, args.no_seek, log)
+            servers[src] = server
 
-            if args.no_seek or stream.average_rate is None or stream.time_base is None:
-                sc_val = 4294967295  # 2 ** 32 - 1
-                tou = 0
-            else:
-                # Keyframes are usually spread out every 5 seconds or less.
-                sc_val = int(stream.average_rate * 5)
-                tou = int(stream.time_base.denominator / stream.average_rate)
+            if src == first_src and server.stream.pix_fmt is not None:
+                target_pix_fmt = server.stream.pix_fmt
 
-            seek_cost[src] = sc_val
-            tous[src] = tou
-            decoders[src] = cn.decode(stream)
-
-            if src == first_src and stream.pix_fmt is not None:
-                target_pix_fmt = stream.pix_fmt
-
-    log.debug(f"Tous: {tous}")
+    log.debug(f"Keyframes: { {s.path.name: len(f.keys) for s, f in servers.items()} }")
     log.debug(f"Clips: {tl.v}")
 
     target_pix_fmt = target_pix_fmt if target_pix_fmt in allowed_pix_fmt else "yuv420p"
@@ -175,20 +637,20 @@ def render_av(
 
     if args.scale == 1.0:
         target_width, target_height = tl.res
-        scale_graph = None
     else:
         target_width = max(round(tl.res[0] * args.scale), 2)
         target_height = max(round(tl.res[1] * args.scale), 2)
-        scale_graph = av.filter.Graph()
-        link_nodes(
-            scale_graph.add(
-                "buffer", video_size="1x1", time_base="1/1", pix_fmt=target_pix_fmt
-            ),
-            scale_graph.add("scale", f"{target_width}:{target_height}"),
-            scale_graph.add("buffersink"),
-        )
 
-    spedup = os.path.join(temp, "spedup0.mp4")
+    out_cmd = ["-pix_fmt", target_pix_fmt]
+
+    if platform == "darwin":
+        # Fix videotoolbox issue with legacy macs
+        out_cmd += ["-allow_sw", "1"]
+
+    if apply_video_later:
+        out_cmd += ["-c:v", "mpeg4", "-qscale:v", "1"]
+    else:
+        out_cmd += video_quality(args, ctr)
 
     cmd = [
         "-hide_banner",
@@ -205,124 +667,117 @@ def render_av(
         f"{tl.tb}",
         "-i",
         "-",
-        "-pix_fmt",
-        target_pix_fmt,
-    ]
-
-    if platform == "darwin":
-        # Fix videotoolbox issue with legacy macs
-        cmd += ["-allow_sw", "1"]
-
-    if apply_video_later:
-        cmd += ["-c:v", "mpeg4", "-qscale:v", "1"]
-    else:
-        cmd += video_quality(args, ctr)
+    ] + out_cmd
 
     # Setting SAR requires re-encoding so we do it here.
+    sar = None
     if src is not None and src.videos and (sar := src.videos[0].sar) is not None:
         cmd.extend(["-vf", f"setsar={sar}"])
 
     cmd.append(spedup)
 
-    process2 = ffmpeg.Popen(cmd, stdin=PIPE, stdout=DEVNULL, stderr=DEVNULL)
-    assert process2.stdin is not None
+    encoder: PyAVEncoder | PipeWriter | None = None
+    if (options := pyav_options(out_cmd)) is not None:
+        try:
+            encoder = PyAVEncoder(
+                spedup,
+                *options,
+                tl.tb,
+                target_width,
+                target_height,
+                target_pix_fmt,
+                sar,
+            )
+        except (av.error.FFmpegError, ValueError) as e:
+            log.debug(f"Can't encode with PyAV, using ffmpeg instead: {e}")
+
+    if encoder is None:
+        encoder = PipeWriter(
+            ffmpeg.Popen(cmd, stdin=PIPE, stdout=DEVNULL, stderr=DEVNULL)
+        )
 
-    # First few frames can have an abnormal keyframe count, so never seek there.
-    seek = 10
-    seek_frame = None
-    frames_saved = 0
+    bar.start(len(frames), "Creating new video")
 
-    bar.start(tl.end, "Creating new video")
+    # Plan which frames each source is asked for, in order, so that they can be
+    # decoded ahead of time.
+    plans: dict[FileInfo, list[int]] = {src: [] for src in servers}
+    layers = [IntervalIndex(layer) for layer in tl.v]
+    for index in frames:
+        for layer in layers:
+            for lobj in layer.at(index):
+                if isinstance(lobj, TlVideo):
+                    plans[lobj.src].append(source_index(lobj, index))
+    for layer in layers:
+        layer.reset()
+
+    readers = {
+        src: DecodeAhead(servers[src], plan) for src, plan in plans.items() if plan
+    }
 
     bg = color(args.background)
     null_frame = make_solid(target_width, target_height, target_pix_fmt, bg)
-    frame_index = -1
+    pool = GraphPool()
+    last_list: list[av.VideoFrame | None | TlRect | TlImage] | None = None
+    last_frame = null_frame
+    overlays: dict[tuple, list[PlaneBlend]] = {}
+    reused = 0
     try:
-        for index in range(tl.end):
-            obj_list: list[VideoFrame | TlRect | TlImage] = []
-            for layer in tl.v:
-                for lobj in layer:
+        for index in frames:
+            # Source frames, or None where a source has ended, and other objects.
+            obj_list: list[av.VideoFrame | None | TlRect | TlImage] = []
+            for layer in layers:
+                for lobj in layer.at(index):
                     if isinstance(lobj, TlVideo):
-                        if index >= lobj.start and index < (lobj.start + lobj.dur):
-                            _i = round((lobj.offset + index - lobj.start) * lobj.speed)
-                            obj_list.append(VideoFrame(_i, lobj.src))
-                    elif index >= lobj.start and index < lobj.start + lobj.dur:
+                        obj_list.append(readers[lobj.src].get())
+                    else:
                         obj_list.append(lobj)
 
+            # Gaps, slowed down clips and still frames are made of the same parts
+            # as the frame before, so send that frame again as is.
+            if last_list is not None and len(obj_list) == len(last_list):
+                if all(a is b for a, b in zip(obj_list, last_list)):
+                    reused += 1
+                    if index % 3 == 0:
+                        bar.tick(index - frames.start)
+                    encoder.write(last_frame)
+                    continue
+
+            # Overlays are drawn in place, but only onto frames made here. Source
+            # frames may be cached, and `null_frame` is shared.
             frame = null_frame
+            owned = False
             for obj in obj_list:
-                if isinstance(obj, VideoFrame):
-                    my_stream = cns[obj.src].streams.video[0]
-                    if frame_index > obj.index:
-                        log.debug(f"Seek: {frame_index} -> 0")
-                        cns[obj.src].seek(0)
-                        try:
-                            frame = next(decoders[obj.src])
-                            frame_index = round(frame.time * tl.tb)
-                        except StopIteration:
-                            pass
-
-                    while frame_index < obj.index:
-                        # Check if skipping ahead is worth it.
-                        if (
-                            obj.index - frame_index > seek_cost[obj.src]
-                            and frame_index > seek
-                        ):
-                            seek = frame_index + (seek_cost[obj.src] // 2)
-                            seek_frame = frame_index
-                            log.debug(f"Seek: {frame_index} -> {obj.index}")
-                            cns[obj.src].seek(
-                                obj.index * tous[obj.src],
-                                stream=my_stream,
-                            )
-
-                        try:
-                            frame = next(decoders[obj.src])
-                            frame_index = round(frame.time * tl.tb)
-                        except StopIteration:
-                            log.debug(f"No source frame at {index=}. Using null frame")
-                            frame = null_frame
-                            break
-
-                        if seek_frame is not None:
-                            log.debug(
-                                f"Skipped {frame_index - seek_frame} frame indexes"
-                            )
-                            frames_saved += frame_index - seek_frame
-                            seek_frame = None
-                        if frame.key_frame:
-                            log.debug(f"Keyframe {frame_index} {frame.pts}")
+                if obj is None or isinstance(obj, av.VideoFrame):
+                    if obj is None:
+                        log.debug(f"No source frame at {index=}. Using null frame")
+                        frame = null_frame
+                    else:
+                        frame = obj
+                    owned = False
 
                     if (frame.width, frame.height) != tl.res:
                         width, height = tl.res
-                        graph = av.filter.Graph()
-                        link_nodes(
-                            graph.add_buffer(template=my_stream),
-                            graph.add(
+                        frame = pool.apply(
+                            frame,
+                            (
                                 "scale",
                                 f"{width}:{height}:force_original_aspect_ratio=decrease:eval=frame",
                             ),
-                            graph.add("pad", f"{width}:{height}:-1:-1:color={bg}"),
-                            graph.add("buffersink"),
+                            ("pad", f"{width}:{height}:-1:-1:color={bg}"),
                         )
-                        graph.push(frame)
-                        frame = graph.pull()
+                        owned = True
                 elif isinstance(obj, TlRect):
-                    graph = av.filter.Graph()
                     x, y = apply_anchor(obj.x, obj.y, obj.width, obj.height, obj.anchor)
-                    link_nodes(
-                        graph.add_buffer(template=my_stream),
-                        graph.add(
+                    frame = pool.apply(
+                        frame,
+                        (
                             "drawbox",
                             f"x={x}:y={y}:w={obj.width}:h={obj.height}:color={obj.fill}:t=fill",
                         ),
-                        graph.add("buffersink"),
                     )
-                    graph.push(frame)
-                    frame = graph.pull()
+                    owned = True
                 elif isinstance(obj, TlImage):
                     img = img_cache[(obj.src, obj.width)]
-                    array = frame.to_ndarray(format="rgb24")
 
                     overlay_h, overlay_w, _ = img.shape
                     x_pos, y_pos = apply_anchor(
@@ -333,50 +788,166 @@ def render_av(
                     y_start = max(y_pos, 0)
                     x_end = min(x_pos + overlay_w, frame.width)
                     y_end = min(y_pos + overlay_h, frame.height)
+                    if x_start >= x_end or y_start >= y_end:
+                        continue
+
+                    if (
+                        frame.format.name not in blend_formats
+                        and target_pix_fmt in blend_formats
+                    ):
+                        frame = frame.reformat(format=target_pix_fmt)
+                        owned = True
+
+                    if frame.format.name in blend_formats:
+                        if not owned:
+                            frame = copy_frame(frame)
+                            owned = True
+                        fmt = frame.format.name
+                        planes = [plane_array(plane) for plane in frame.planes]
+                    else:
+                        array = np.asarray(frame.to_ndarray(format="rgb24"), np.uint8)
+                        fmt = "rgb24"
+                        planes = [array[:, :, i] for i in range(3)]
+
+                    area = (x_pos, y_pos, x_end, y_end)
+                    key = (obj.src, obj.width, obj.opacity, area, fmt)
+                    if (blends := overlays.get(key)) is None:
+                        # Clip the overlay image to fit into the frame
+                        clipped = img[
+                            y_start - y_pos : y_end - y_pos,
+                            x_start - x_pos : x_end - x_pos,
+                        ]
+                        blends = prepare_overlay(
+                            clipped, obj.opacity, fmt, x_start, y_start
+                        )
+                        overlays[key] = blends
 
-                    # Clip the overlay image to fit into the frame
-                    overlay_x_start = max(-x_pos, 0)
-                    overlay_y_start = max(-y_pos, 0)
-                    overlay_x_end = overlay_w - max(
-                        (x_pos + overlay_w) - frame.width, 0
-                    )
-                    overlay_y_end = overlay_h - max(
-                        (y_pos + overlay_h) - frame.height, 0
-                    )
-                    clipped_overlay = img[
-                        overlay_y_start:overlay_y_end, overlay_x_start:overlay_x_end
-                    ]
-
-                    # Create a region of interest (ROI) on the video frame
-                    roi = array[y_start:y_end, x_start:x_end]
-
-                    # Blend the overlay image with the ROI based on the opacity
-                    roi = (1 - obj.opacity) * roi + obj.opacity * clipped_overlay
-                    array[y_start:y_end, x_start:x_end] = roi
-                    array = np.clip(array, 0, 255).astype(np.uint8)
-
-                    frame = av.VideoFrame.from_ndarray(array, format="rgb24")
+                    blend_overlay(planes, blends)
+                    if fmt == "rgb24":
+                        frame = av.VideoFrame.from_ndarray(array, format="rgb24")
+                        owned = True
 
-            if scale_graph is not None and frame.width != target_width:
-                scale_graph.push(frame)
-                frame = scale_graph.pull()
+            if frame.width != target_width:
+                frame = pool.apply(frame, ("scale", f"{target_width}:{target_height}"))
 
             if frame.format.name != target_pix_fmt:
                 frame = frame.reformat(format=target_pix_fmt)
-                bar.tick(index)
+                bar.tick(index - frames.start)
             elif index % 3 == 0:
-                bar.tick(index)
+                bar.tick(index - frames.start)
 
-            process2.stdin.write(frame.to_ndarray().tobytes())
+            encoder.write(frame)
+            last_list = obj_list
+            last_frame = frame
 
         bar.end()
-        process2.stdin.close()
-        process2.wait()
+        encoder.close()
+    except av.error.FFmpegError as e:
+        bar.end()
+        log.error(f"Could not encode video: {e}")
     except (OSError, BrokenPipeError):
         bar.end()
         ffmpeg.run_check_errors(cmd, log, True)
         log.error("FFmpeg Error!")
 
-    log.debug(f"Total frames saved seeking: {frames_saved}")
+    for reader in readers.values():
+        reader.close()
+
+    skipped = 0
+    for server in servers.values():
+        skipped += server.skipped
+        server.close()
+    log.debug(f"Total frames skipped seeking: {skipped}")
+    log.debug(f"Total frames reused: {reused}")
+
+    return apply_video_later
+
+
+def split_timeline(tl: v3, jobs: int) -> list[range]:
+    """
+    Split the timeline into up to `jobs` ranges of about the same length. Each
+    split moves to the nearest clip boundary when one is close, so fewer clips
+    are divided between segments.
+    """
+    bounds = {0, tl.end}
+    for layer in tl.v:
+        for obj in layer:
+            bounds.update((obj.start, obj.start + obj.dur))
+    edges = sorted(b for b in bounds if 0 <= b <= tl.end)
+
+    size = tl.end / jobs
+    splits = [0]
+    for k in range(1, jobs):
+        target = round(size * k)
+        i = bisect_left(edges, target)
+        near = min(edges[max(i - 1, 0) : i + 1], key=lambda b: abs(b - target))
+        split = near if abs(near - target) <= size / 4 else target
+        if splits[-1] < split < tl.end:
+            splits.append(split)
+    splits.append(tl.end)
+
+    return [range(a, b) for a, b in zip(splits, splits[1:])]
+
+
+def _render_segment(
+    ffmpeg: FFmpeg,
+    tl: v3,
+    args: Args,
+    ctr: Container,
+    temp: str,
+    frames: range,
+    spedup: str,
+    debug: bool,
+) -> bool:
+    log = WorkerLog(debug, quiet=True)
+    return render_frames(ffmpeg, tl, args, Bar("none"), ctr, temp, log, frames, spedup)
+
+
+def render_av(
+    ffmpeg: FFmpeg,
+    tl: v3,
+    args: Args,
+    bar: Bar,
+    ctr: Container,
+    temp: str,
+    log: Log,
+) -> tuple[str, bool]:
+    spedup = os.path.join(temp, "spedup0.mp4")
+
+    jobs = args.render_jobs or os.cpu_count() or 1
+    segments = split_timeline(tl, jobs) if jobs > 1 else []
+    if len(segments) < 2:
+        return spedup, render_frames(
+            ffmpeg, tl, args, bar, ctr, temp, log, range(tl.end), spedup
+        )
+
+    log.debug(f"Render segments: {segments}")
+
+    # Build every keyframe index once, so the workers only read it from the cache.
+    if not args.no_seek:
+        cache = analysis_cache(temp, args)
+        for src in tl.sources:
+            if src.videos:
+                keyframes(src, tl.tb, cache)
+    paths = [os.path.join(temp, f"segment{i:x}.mp4") for i in range(len(segments))]
+
+    bar.start(tl.end, "Creating new video")
+    jobs_args = [
+        (ffmpeg, tl, args, ctr, temp, frames, path, log.is_debug)
+        for frames, path in zip(segments, paths)
+    ]
+    weights = [len(frames) for frames in segments]
+    results = run_workers(_render_segment, jobs_args, len(segments), bar, log, weights)
+    bar.end()
+
+    # Every segment comes from the same encoder settings, so they can be joined
+    # without re-encoding.
+    concat_list = os.path.join(temp, "segments.txt")
+    with open(concat_list, "w", encoding="utf-8") as file:
+        for path in paths:
+            quoted = path.replace("'", "'\\''")
+            file.write(f"file '{quoted}'\n")
+
+    ffmpeg.run(["-f", "concat", "-safe", "0", "-i", concat_list, "-c", "copy", spedup])
 
-    return spedup, apply_video_later
+    return spedup, results[0]
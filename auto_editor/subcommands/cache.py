@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import os.path
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+from tempfile import gettempdir
+
+from auto_editor.cache import DEFAULT_MAX_AGE, DEFAULT_MAX_SIZE, Cache, cache_dir
+from auto_editor.utils.log import Log
+from auto_editor.utils.types import byte_size, number
+from auto_editor.vanparse import ArgumentParser
+
+
+@dataclass(slots=True)
+class CacheArgs:
+    action: str = "stat"
+    max_size: int = DEFAULT_MAX_SIZE
+    max_age: float = DEFAULT_MAX_AGE / 86400
+    temp_dir: str | None = None
+    help: bool = False
+
+
+def cache_options(parser: ArgumentParser) -> ArgumentParser:
+    parser.add_required(
+        "action",
+        nargs=1,
+        choices=("list", "stat", "prune", "clear"),
+        metavar="action [options]",
+    )
+    parser.add_argument(
+        "--max-size",
+        type=byte_size,
+        metavar="SIZE",
+        help="prune: Remove the least recently used entries until the cache fits SIZE",
+    )
+    parser.add_argument(
+        "--max-age",
+        type=number,
+        metavar="DAYS",
+        help="prune: Remove entries that have not been used in DAYS days",
+    )
+    parser.add_argument(
+        "--temp-dir",
+        metavar="PATH",
+        help="Use the cache next to this temp directory instead of the default one",
+    )
+    return parser
+
+
+def human_size(size: float) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+def main(sys_args: list[str] = sys.argv[1:]) -> None:
+    args = cache_options(ArgumentParser("cache")).parse_args(CacheArgs, sys_args)
+    log = Log()
+
+    # By default, temp directories are made inside of `gettempdir()`.
+    temp = os.path.join(gettempdir(), "") if args.temp_dir is None else args.temp_dir
+    cache = Cache(cache_dir(temp), args.max_size, args.max_age * 86400)
+
+    if args.action == "list":
+        for e in cache.entries():
+            used = datetime.fromtimestamp(e.last_used).strftime("%Y-%m-%d %H:%M")
+            stale = "  (stale)" if e.is_stale else ""
+            sys.stdout.write(
+                f"{e.digest[:12]}  {human_size(e.size):>10}  {used}  {e.key}\n"
+                f"    {e.src}{stale}\n"
+            )
+
+    elif args.action == "stat":
+        entries = cache.entries()
+        total = sum(e.size for e in entries)
+        stale_count = sum(1 for e in entries if e.is_stale)
+        sources = len({e.src for e in entries})
+        sys.stdout.write(
+            f"location: {cache.root}\n"
+            f"entries: {len(entries)}\n"
+            f"sources: {sources}\n"
+            f"stale: {stale_count}\n"
+            f"size: {human_size(total)}\n"
+        )
+
+    elif args.action == "prune":
+        removed = cache.evict(stale=True)
+        freed = human_size(sum(e.size for e in removed))
+        log.print(f"Removed {len(removed)} entries, freed {freed}")
+
+    elif args.action == "clear":
+        entries = cache.entries()
+        cache.remove(entries)
+        log.print(f"Removed {len(entries)} entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -113,7 +113,15 @@ def main(sys_args: list[str] = sys.argv[1:]) -> None:
             if method == "audio":
                 print_arr(levels.audio(obj["stream"]))
             elif method == "motion":
-                print_arr(levels.motion(obj["stream"], obj["blur"], obj["width"]))
+                print_arr(
+                    levels.motion(
+                        obj["stream"],
+                        obj["blur"],
+                        obj["width"],
+                        obj["stride"],
+                        obj["fast"],
+                    )
+                )
             elif method == "subtitle":
                 print_arr(
                     levels.subtitle(
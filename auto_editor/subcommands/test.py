@@ -1,18 +1,24 @@
 # type: ignore
 from __future__ import annotations
 
+import json
 import os
+import re
 import shutil
 import subprocess
 import sys
 from collections.abc import Callable
 from dataclasses import dataclass, field
 from fractions import Fraction
+from tempfile import mkdtemp
 from time import perf_counter
 from typing import Any
 
+import av
 import numpy as np
 
+from auto_editor.analyze import quantize, to_threshold
+from auto_editor.cache import Cache, cache_dir
 from auto_editor.ffwrapper import FileInfo, initFileInfo
 from auto_editor.lang.palet import Lexer, Parser, env, interpret
 from auto_editor.lib.data_structs import Char
@@ -54,6 +60,16 @@ class Checker:
     def check(self, path: str) -> FileInfo:
         return initFileInfo(path, self.log)
 
+    def frames(self, path: str) -> np.ndarray:
+        """Decode every frame of the first video stream, small and in gray."""
+        with av.open(path) as container:
+            return np.stack(
+                [
+                    frame.to_ndarray(width=160, height=90, format="gray")
+                    for frame in container.decode(video=0)
+                ]
+            ).astype(np.int16)
+
 
 class Runner:
     def __init__(self) -> None:
@@ -90,6 +106,14 @@ class Runner:
 
         return output
 
+    def debug(self, cmd: list[str]) -> str:
+        """Run with `--debug`, and return what was logged."""
+        cmd = self.program + cmd + ["--debug", "--no-open"]
+        returncode, stdout, stderr = pipe_to_console(cmd)
+        if returncode > 0:
+            raise Exception(f"{stdout}\n{stderr}\n")
+        return stderr
+
     def raw(self, cmd: list[str]) -> None:
         returncode, stdout, stderr = pipe_to_console(self.program + cmd)
         if returncode > 0:
@@ -227,6 +251,63 @@ def main(sys_args: list[str] | None = None):
     def desc():
         run.raw(["desc", "example.mp4"])
 
+    def cache():
+        base = mkdtemp()
+        temp = os.path.join(base, "temp")
+        root = cache_dir(temp)
+        a, b = os.path.join(base, "a.mp4"), os.path.join(base, "b.mp4")
+        shutil.copy("example.mp4", a)
+        shutil.copy("example.mp4", b)
+
+        out = ["--temp-dir", temp, "--export", "json", "-o", f"{base}/out.json"]
+
+        def edit(path: str, *cmd: str) -> set[str]:
+            run.raw([path, *out, *cmd])
+            return {e.digest for e in Cache(root).entries() if e.src == path}
+
+        try:
+            run.raw(["levels", "example.mp4"])
+            first = edit(a)
+            assert first and edit(a) == first
+
+            # A newer modification time, or new content with the same size and
+            # time, is a different source.
+            stat = os.stat(a)
+            os.utime(a, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            touched = edit(a)
+            assert touched.isdisjoint(first)
+
+            stat = os.stat(a)
+            with open(a, "r+b") as file:
+                file.seek(stat.st_size // 2)
+                byte = file.read(1)
+                file.seek(-1, os.SEEK_CUR)
+                file.write(bytes([byte[0] ^ 1]))
+            os.utime(a, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            assert edit(a).isdisjoint(touched)
+
+            edit(a, "--levels-dtype", "uint16")
+            edit(b)
+            os.remove(b)
+            run.raw(["cache", "stat", "--temp-dir", temp])
+            run.raw(["cache", "list", "--temp-dir", temp])
+            run.raw(["cache", "prune", "--temp-dir", temp])
+            entries = Cache(root).entries()
+            assert entries and all(e.src == a for e in entries)
+
+            total = sum(e.size for e in entries)
+            run.raw(
+                ["cache", "prune", "--temp-dir", temp, "--max-size", f"{total - 1}"]
+            )
+            assert 0 < sum(e.size for e in Cache(root).entries()) < total
+
+            assert edit(a, "--cache-max-size", "0") == set()
+
+            run.raw(["cache", "clear", "--temp-dir", temp])
+            assert os.listdir(root) == []
+        finally:
+            shutil.rmtree(base)
+
     def example():
         out = run.main(inputs=["example.mp4"], cmd=[])
         cn = checker.check(out)
@@ -260,6 +341,18 @@ def main(sys_args: list[str] | None = None):
     def video_speed():
         return run.main(["example.mp4"], ["--video-speed", "1.5"])
 
+    def slow_speed():
+        cmd = ["--edit", "none", "--cut-out", "4sec,end", "--video-speed", "0.5"]
+        out = "slow.mp4"
+        log = run.debug(["example.mp4", *cmd, "-o", out])
+        assert abs(float(checker.check(out).videos[0].duration) - 8) < 0.1
+
+        # Every source frame is shown twice, and the second time is sent again as is.
+        reused = re.search(r"Total frames reused: (\d+)", log)
+        assert reused is not None and int(reused[1]) >= 119, log
+
+        return out
+
     def backwards_range():
         """
         Cut out the last 5 seconds of a media file by using negative number in the
@@ -345,6 +438,62 @@ def main(sys_args: list[str] | None = None):
         out2 = run.main([out], [])
         return out, out2
 
+    def reused_footage():
+        out = run.main(["example.mp4"], ["--export_as_json"])
+        with open(out, encoding="utf-8") as file:
+            tl = json.load(file)
+
+        # Play every clip forwards, then again backwards.
+        for layers in (tl["v"], tl["a"]):
+            clips = layers[0] + [dict(clip) for clip in reversed(layers[0])]
+            start = 0
+            for clip in clips:
+                clip["start"] = start
+                start += clip["dur"]
+            layers[0] = clips
+
+        with open("reused.json", "w", encoding="utf-8") as file:
+            json.dump(tl, file)
+
+        once = checker.check(run.main([out], [], "once.mp4")).videos[0]
+        twice = checker.check(run.main(["reused.json"], [], "reused.mp4")).videos[0]
+        assert abs(float(twice.duration) - 2 * float(once.duration)) < 0.1
+
+        return out, "reused.json", "once.mp4", "reused.mp4"
+
+    def image_overlay():
+        # A half transparent white square over the left half, opaque on the right.
+        img = np.full((64, 64, 4), 255, dtype=np.uint8)
+        img[:, :32, 3] = 128
+        with av.open("overlay.png", "w") as output:
+            stream = output.add_stream("png")
+            stream.width, stream.height, stream.pix_fmt = 64, 64, "rgba"
+            for packet in stream.encode(av.VideoFrame.from_ndarray(img, "rgba")):
+                output.mux(packet)
+
+        out = run.main(["example.mp4"], ["--edit", "none", "--export_as_json"])
+        with open(out, encoding="utf-8") as file:
+            tl = json.load(file)
+        image = {"name": "image", "src": "overlay.png", "start": 0, "dur": 30}
+        image |= {"x": 16, "y": 16, "width": 0, "opacity": 1, "anchor": "tl"}
+        tl["v"].append([image])
+        with open("overlay.json", "w", encoding="utf-8") as file:
+            json.dump(tl, file)
+
+        def first_frame(path: str) -> np.ndarray:
+            with av.open(path) as container:
+                frame = next(container.decode(video=0))
+                return frame.to_ndarray(format="gray").astype(int)
+
+        plain = first_frame(run.main([out], [], "plain.mp4"))
+        drawn = first_frame(run.main(["overlay.json"], [], "drawn.mp4"))
+        assert np.abs(drawn[60:76, 60:76] - 255).max() < 8
+        half = (plain[20:76, 20:44] + 255) / 2
+        assert np.abs(drawn[20:76, 20:44] - half).mean() < 8
+        assert np.abs(drawn[100:, 100:] - plain[100:, 100:]).mean() < 2
+
+        return out, "overlay.png", "overlay.json", "plain.mp4", "drawn.mp4"
+
     def premiere_named_export():
         run.main(["example.mp4"], ["--export", 'premiere:name="Foo Bar"'])
 
@@ -417,6 +566,14 @@ def main(sys_args: list[str] | None = None):
         out2 = run.main(["example.mp4", "hmm.mp4"], ["--debug"])
         return out, out2
 
+    def concat_jobs():
+        inputs = ["example.mp4", "resources/multi-track.mov", "resources/subtitle.mp4"]
+        out = run.main(inputs, ["--jobs", "1"], "jobs1.mp4")
+        out2 = run.main(inputs, ["--jobs", "3"], "jobs3.mp4")
+        assert checker.check(out).duration == checker.check(out2).duration
+
+        return out, out2
+
     def concat_mux_tracks():
         out = run.main(["example.mp4", "resources/multi-track.mov"], [], "out.mov")
         assert len(checker.check(out).audios) == 1
@@ -493,7 +650,12 @@ def main(sys_args: list[str] | None = None):
             ["resources/only-video/man-on-green-screen.mp4"],
             ["--edit", "motion:threshold=0,width=200"],
         )
-        return out, out2
+        out3 = run.main(
+            ["resources/only-video/man-on-green-screen.mp4"],
+            ["--edit", "(motion #:stride 3 #:fast #t)", "--margin", "0"],
+            "fast.mp4",
+        )
+        return out, out2, out3
 
     def edit_positive_tests():
         run.main(["resources/multi-track.mov"], ["--edit", "audio:stream=all"])
@@ -508,6 +670,115 @@ def main(sys_args: list[str] | None = None):
         )
         return out
 
+    def motion_jobs():
+        # Analyzing motion in parts must give the same timeline as in one go. Each
+        # run gets its own temp dir, so it can't find the other's cached levels.
+        timelines = []
+        for jobs in ("1", "4"):
+            os.makedirs(f"jobs{jobs}", exist_ok=True)
+            cmd = ["--edit", "motion:threshold=0.2%", "--margin", "0", "--jobs", jobs]
+            cmd += ["--temp-dir", f"jobs{jobs}/temp", "--export_as_json"]
+            out = run.main(["example.mp4"], cmd, f"jobs{jobs}.json")
+            with open(out, encoding="utf-8") as file:
+                timelines.append(json.load(file)["v"])
+            os.remove(out)
+            shutil.rmtree(f"jobs{jobs}")
+
+        assert timelines[0] == timelines[1]
+        assert len(timelines[0][0]) > 1
+
+    def edit_one_pass():
+        # Analyze everything in one pass, then again with streams that can only be
+        # known by running the expression, so each method decodes the source itself.
+        edit = '(or (subtitle "boop" {}) (not (audio 0 {})) (not (motion 0 {})))'
+        cmd = ["resources/subtitle.mp4", "--export_as_json", "--edit"]
+        out = run.main(cmd, [edit.format("", "", "#:width 123")], "one.json")
+        lazy = edit.format(*["#:stream (+ 0 0)"] * 2, "#:stream (+ 0 0) #:width 123")
+        out2 = run.main(cmd, [lazy], "each.json")
+
+        with open(out, encoding="utf-8") as file:
+            one = json.load(file)
+        with open(out2, encoding="utf-8") as file:
+            each = json.load(file)
+        assert one["v"] == each["v"] and one["a"] == each["a"]
+        assert len(one["v"][0]) > 0
+
+        return out, out2
+
+    def levels_dtype():
+        timelines = []
+        for dtype in ("float64", "float32", "uint16"):
+            cmd = ["--levels-dtype", dtype, "--export_as_json"]
+            out = run.main(["example.mp4"], cmd, f"{dtype}.json")
+            with open(out, encoding="utf-8") as file:
+                tl = json.load(file)
+            timelines.append((tl["v"], tl["a"]))
+            os.remove(out)
+
+        assert timelines[0] == timelines[1] == timelines[2]
+        assert len(timelines[0][0][0]) > 1
+
+        # A level right at the threshold must stay loud after quantizing.
+        levels = np.array([0.04, 0.0399])
+        for dtype in ("float64", "float32", "uint16"):
+            loud = to_threshold(quantize(levels, dtype), 0.04)
+            assert loud.tolist() == [True, False], (dtype, loud)
+
+    def keyframe_seek():
+        cuts = ["--edit", "none", "--cut-out", "1sec,5sec", "8sec,20sec", "25sec,35sec"]
+        out = run.main(["example.mp4"], cuts, "seek.mp4")
+        out2 = run.main(["example.mp4"], cuts + ["--no-seek"], "noseek.mp4")
+        cn, cn2 = checker.check(out), checker.check(out2)
+        assert cn.videos[0].duration == cn2.videos[0].duration
+        # Both get the same source frames, so they encode the same.
+        assert np.array_equal(checker.frames(out), checker.frames(out2))
+
+        return out, out2
+
+    def render_jobs():
+        out = run.main(["example.mp4"], ["--render-jobs", "1"], "render1.mp4")
+        out2 = run.main(["example.mp4"], ["--render-jobs", "3"], "render3.mp4")
+        cn, cn2 = checker.check(out), checker.check(out2)
+        assert cn.videos[0].duration == cn2.videos[0].duration
+
+        # Segments are encoded on their own, so frames can differ a little, but much
+        # less than from one frame to the next.
+        frames, frames2 = checker.frames(out), checker.frames(out2)
+        assert frames.shape == frames2.shape
+        assert np.abs(frames - frames2).mean(axis=(1, 2)).max() < 0.01
+
+        return out, out2
+
+    def smart_render():
+        out = run.main(["example.mp4"], [])
+        out2 = "smart.mp4"
+        cmd = ["example.mp4", "--smart-render", "--debug", "--no-open", "-o", out2]
+        returncode, stdout, stderr = pipe_to_console(run.program + cmd)
+        if returncode > 0:
+            raise Exception(f"{stdout}\n{stderr}\n")
+
+        # It must not have fallen back to a normal render, and must have copied GOPs.
+        assert "Can't smart render" not in stderr, stderr
+        plan = [line for line in stderr.splitlines() if "Smart render segments" in line]
+        assert plan and "(True," in plan[0], stderr
+
+        cn, cn2 = checker.check(out), checker.check(out2)
+        assert cn2.videos[0].codec == "h264"
+        assert cn.videos[0].duration == cn2.videos[0].duration
+
+        # Every frame is presented exactly one frame after the last, and dts only
+        # goes up, even where copied and re-encoded segments meet.
+        with av.open(out2) as container:
+            stream = container.streams.video[0]
+            packets = [p for p in container.demux(stream) if p.pts is not None]
+            frame = 1 / (stream.time_base * 30)
+            assert stream.average_rate == 30
+        pts = np.sort([p.pts for p in packets])
+        assert np.all(np.diff(pts) == frame), np.diff(pts)
+        assert np.all(np.diff([p.dts for p in packets]) > 0)
+
+        return out, out2
+
     def edit_negative_tests():
         run.check(
             ["resources/wav/example-cut-s16le.wav", "--edit", "motion"],
@@ -629,6 +900,22 @@ def main(sys_args: list[str] | None = None):
                 "(margin -2 2 (bool-array 0 0 1 1 0 0 0))",
                 np.array([0, 0, 0, 0, 1, 1, 0], dtype=np.bool_),
             ),
+            (
+                "(minclip (bool-array 1 0 1 1 0 1 1 1 0 1 1) 3)",
+                np.array([0, 0, 0, 0, 0, 1, 1, 1, 0, 0, 0], dtype=np.bool_),
+            ),
+            (
+                "(mincut (bool-array 0 1 0 0 1 0 0 0 1 0 0) 3)",
+                np.array([1, 1, 1, 1, 1, 0, 0, 0, 1, 1, 1], dtype=np.bool_),
+            ),
+            (
+                "(maxclip (bool-array 1 1 0 1 1 1 0 1 1 1) 2)",
+                np.array([1, 1, 0, 0, 0, 0, 0, 0, 0, 0], dtype=np.bool_),
+            ),
+            (
+                "(maxcut (bool-array 0 0 1 0 0 0 1 0 0 0) 2)",
+                np.array([0, 0, 1, 1, 1, 1, 1, 1, 1, 1], dtype=np.bool_),
+            ),
             ("(equal? 3 3)", True),
             ("(equal? 3 3.0)", False),
             ('(equal? 16.3 "Editor")', False),
@@ -699,7 +986,7 @@ def main(sys_args: list[str] | None = None):
         tests.extend([palet_python_bridge, palet_scripts])
 
     if args.category in ("sub", "all"):
-        tests.extend([info, levels, subdump, desc])
+        tests.extend([info, levels, subdump, desc, cache])
 
     if args.category in ("cli", "all"):
         tests.extend(
@@ -709,13 +996,23 @@ def main(sys_args: list[str] | None = None):
                 yuv442p,
                 edit_negative_tests,
                 edit_positive_tests,
+                edit_one_pass,
+                motion_jobs,
+                levels_dtype,
+                keyframe_seek,
+                render_jobs,
+                smart_render,
                 audio_norm_f,
                 audio_norm_ebu,
                 json_tests,
+                reused_footage,
+                image_overlay,
                 high_speed_test,
                 video_speed,
+                slow_speed,
                 multi_track_edit,
                 concat_mux_tracks,
+                concat_jobs,
                 concat_multiple_tracks,
                 frame_rate,
                 help_tests,
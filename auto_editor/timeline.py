@@ -1,9 +1,10 @@
 from __future__ import annotations
 
-from collections.abc import Iterator
+from bisect import insort
+from collections.abc import Iterator, Sequence
 from dataclasses import dataclass
 from fractions import Fraction
-from typing import Any
+from typing import Any, Generic, TypeVar
 
 from auto_editor.ffwrapper import FileInfo
 from auto_editor.lib.contracts import *
@@ -184,6 +185,42 @@ VSpace = list[VLayer]
 ALayer = list[TlAudio]
 ASpace = list[ALayer]
 
+T = TypeVar("T", bound=TlVideo | TlAudio | TlImage | TlRect)
+
+
+class IntervalIndex(Generic[T]):
+    """
+    Find the objects of a layer that cover a frame, in the order they appear in
+    the layer. Frames are expected to be asked for in increasing order, which
+    costs amortized O(1) per frame on top of the number of objects returned.
+    Asking for an earlier frame starts the sweep over.
+    """
+
+    __slots__ = ("layer", "order", "cursor", "active", "last")
+
+    def __init__(self, layer: Sequence[T]):
+        self.layer = layer
+        self.order = sorted(range(len(layer)), key=lambda i: layer[i].start)
+        self.reset()
+
+    def reset(self) -> None:
+        self.cursor = 0
+        self.active: list[int] = []
+        self.last = -1
+
+    def at(self, index: int) -> list[T]:
+        if index < self.last:
+            self.reset()
+        self.last = index
+
+        layer, order = self.layer, self.order
+        while self.cursor < len(order) and layer[order[self.cursor]].start <= index:
+            insort(self.active, order[self.cursor])
+            self.cursor += 1
+
+        self.active = [i for i in self.active if index < layer[i].start + layer[i].dur]
+        return [layer[i] for i in self.active]
+
 
 @dataclass
 class v3:
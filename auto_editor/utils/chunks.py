@@ -1,2 +1,69 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from numpy.typing import NDArray
+
 Chunk = tuple[int, int, float]
 Chunks = list[Chunk]
+
+
+@dataclass(slots=True)
+class Runs:
+    """
+    Runs of equal values in a per-frame array, stored as parallel arrays.
+    `starts` and `ends` are relative to the beginning of the run's source.
+    """
+
+    starts: NDArray[np.int64]
+    ends: NDArray[np.int64]
+    values: NDArray[np.int64]
+    srcs: NDArray[np.int64]
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def to_chunks(self, speed_map: list[float]) -> Chunks:
+        return [
+            (start, end, speed_map[val])
+            for start, end, val in zip(
+                self.starts.tolist(), self.ends.tolist(), self.values.tolist()
+            )
+        ]
+
+
+def runs_of(arr: NDArray, src_index: NDArray[np.int32] | None = None) -> Runs:
+    """
+    Run-length encode `arr`. A run also ends wherever `src_index` changes.
+
+    Example: [1, 1, 1, 2, 2] => starts [0, 3], ends [3, 5], values [1, 2]
+    """
+    size = len(arr)
+    if size == 0:
+        empty = np.array([], dtype=np.int64)
+        return Runs(empty, empty, empty, empty)
+
+    change = arr[1:] != arr[:-1]
+    if src_index is not None:
+        change |= src_index[1:] != src_index[:-1]
+
+    bounds = np.flatnonzero(change) + 1
+    starts = np.concatenate(([0], bounds)).astype(np.int64)
+    ends = np.concatenate((bounds, [size])).astype(np.int64)
+    values = arr[starts].astype(np.int64)
+
+    if src_index is None:
+        return Runs(starts, ends, values, np.zeros(len(starts), dtype=np.int64))
+
+    srcs = src_index[starts].astype(np.int64)
+
+    # Shift every run by where its source begins.
+    first = np.ones(len(starts), dtype=np.bool_)
+    first[1:] = srcs[1:] != srcs[:-1]
+    origin = np.maximum.accumulate(np.where(first, starts, 0))
+
+    return Runs(starts - origin, ends - origin, values, srcs)
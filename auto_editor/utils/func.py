@@ -71,43 +71,44 @@ def to_timecode(secs: float | Fraction, fmt: str) -> str:
     raise ValueError("to_timecode: Unreachable")
 
 
+def _cover(size: int, lo: NDArray[np.intp], hi: NDArray[np.intp]) -> BoolList:
+    """Return which indexes are inside of at least one [lo, hi) range."""
+    marks = np.bincount(lo, minlength=size + 1) - np.bincount(hi, minlength=size + 1)
+    return np.cumsum(marks[:size]) > 0
+
+
 def mut_margin(arr: BoolList, start_m: int, end_m: int) -> None:
     # Find start and end indexes
-    start_index = []
-    end_index = []
+    edges = np.flatnonzero(arr[1:] != arr[:-1]) + 1
+    start_index = edges[arr[edges]]
+    end_index = edges[~arr[edges]]
     arrlen = len(arr)
-    for j in range(1, arrlen):
-        if arr[j] != arr[j - 1]:
-            if arr[j]:
-                start_index.append(j)
-            else:
-                end_index.append(j)
 
     # Apply margin
     if start_m > 0:
-        for i in start_index:
-            arr[max(i - start_m, 0) : i] = True
+        arr[_cover(arrlen, np.maximum(start_index - start_m, 0), start_index)] = True
     if start_m < 0:
-        for i in start_index:
-            arr[i : min(i - start_m, arrlen)] = False
+        stop_index = np.minimum(start_index - start_m, arrlen)
+        arr[_cover(arrlen, start_index, stop_index)] = False
 
     if end_m > 0:
-        for i in end_index:
-            arr[i : min(i + end_m, arrlen)] = True
+        arr[_cover(arrlen, end_index, np.minimum(end_index + end_m, arrlen))] = True
     if end_m < 0:
-        for i in end_index:
-            arr[max(i + end_m, 0) : i] = False
+        arr[_cover(arrlen, np.maximum(end_index + end_m, 0), end_index)] = False
 
 
 def merge(start_list: np.ndarray, end_list: np.ndarray) -> BoolList:
-    result = np.zeros((len(start_list)), dtype=np.bool_)
-
-    for i, item in enumerate(start_list):
-        if item == True:
-            where = np.where(end_list[i:])[0]
-            if len(where) > 0:
-                result[i : where[0]] = True
-    return result
+    """
+    Mark everything from each true item in `start_list` up to the next true item
+    in `end_list`. Starts with no end after them are ignored.
+    """
+    size = len(start_list)
+    ends = np.where(end_list[:size], np.arange(size), size)
+    next_end = np.minimum.accumulate(ends[::-1])[::-1]
+
+    starts = np.flatnonzero(start_list)
+    starts = starts[next_end[starts] < size]
+    return _cover(size, starts, next_end[starts])
 
 
 def get_stdout(cmd: list[str]) -> str:
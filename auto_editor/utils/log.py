@@ -5,7 +5,15 @@ from datetime import timedelta
 from pathlib import Path
 from shutil import get_terminal_size, rmtree
 from time import perf_counter, sleep
-from typing import NoReturn
+from typing import TYPE_CHECKING, NoReturn, TypeVar
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from typing import Any
+
+    from auto_editor.utils.bar import Bar
+
+T = TypeVar("T")
 
 
 class Timer:
@@ -91,3 +99,54 @@ class Log:
         if not self.quiet:
             self.conwrite("")
             sys.stdout.write(f"{message}\n")
+
+
+class WorkerError(Exception):
+    pass
+
+
+class WorkerLog(Log):
+    """Hand errors back to the main process instead of exiting."""
+
+    __slots__ = ()
+
+    def error(self, message: str | Exception) -> NoReturn:
+        if self.is_debug and isinstance(message, Exception):
+            raise message
+        raise WorkerError(f"{message}")
+
+
+def run_workers(
+    func: Callable[..., T],
+    jobs: list[tuple[Any, ...]],
+    workers: int,
+    bar: Bar,
+    log: Log,
+    weights: list[int] | None = None,
+) -> list[T]:
+    """
+    Call `func` with each job's arguments in a pool of processes, ticking `bar` by
+    each job's weight as it finishes. Return the results in the order of `jobs`.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    error: WorkerError | None = None
+    with ProcessPoolExecutor(workers) as pool:
+        futures = {
+            pool.submit(func, *args): weight
+            for args, weight in zip(jobs, weights or [1] * len(jobs))
+        }
+        done = 0
+        try:
+            for future in as_completed(futures):
+                future.result()
+                done += futures[future]
+                bar.tick(done)
+        except WorkerError as e:
+            pool.shutdown(cancel_futures=True)
+            error = e
+
+    if error is not None:
+        bar.end()
+        log.error(error)
+    return [future.result() for future in futures]
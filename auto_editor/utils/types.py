@@ -122,6 +122,17 @@ def bitrate(val: str) -> str:
     return val
 
 
+def byte_size(val: str) -> int:
+    num, unit = _split_num_str(val)
+    units = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+    _unit = unit.upper().removesuffix("B").removesuffix("I")
+    if _unit not in units:
+        raise CoerceError(f"`{val}` is not a valid size. Use the units: K, M, G")
+    if num < 0:
+        raise CoerceError(f"'{val}': Size cannot be negative.")
+    return int(num * units[_unit])
+
+
 def time(val: str, tb: Fraction) -> int:
     if ":" in val:
         boxes = val.split(":")
@@ -231,6 +242,8 @@ class Args:
     extras: str | None = None
     sn: bool = False
     no_seek: bool = False
+    smart_render: bool = False
+    render_jobs: int = 1
     cut_out: list[list[str]] = field(default_factory=list)
     add_in: list[list[str]] = field(default_factory=list)
     set_speed_for_range: list[tuple[float, str, str]] = field(default_factory=list)
@@ -239,14 +252,18 @@ class Args:
     resolution: tuple[int, int] | None = None
     background: str = "#000"
     edit_based_on: str = "audio"
+    levels_dtype: str = "float64"
     keep_tracks_separate: bool = False
     audio_normalize: str = "#f"
     export: str | None = None
     player: str | None = None
     no_open: bool = False
     temp_dir: str | None = None
+    cache_max_size: int = 1 << 30
+    cache_max_age: float = 30.0
     ffmpeg_location: str | None = None
     my_ffmpeg: bool = False
+    jobs: int = 1
     progress: str = "modern"
     version: bool = False
     debug: bool = False